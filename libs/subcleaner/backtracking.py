@@ -0,0 +1,137 @@
+from re import compile, IGNORECASE, UNICODE
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+_CHARACTERS = (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN)
+_CATEGORIES = {
+    "CATEGORY_DIGIT": compile(r"\d"),
+    "CATEGORY_NOT_DIGIT": compile(r"\D"),
+    "CATEGORY_SPACE": compile(r"\s"),
+    "CATEGORY_NOT_SPACE": compile(r"\S"),
+    "CATEGORY_WORD": compile(r"\w"),
+    "CATEGORY_NOT_WORD": compile(r"\W"),
+}
+# characters two branches are tried on to see if both can start with the same one.
+_ALPHABET = [chr(code) for code in range(0x250)] + list("İıſµΩ€™©♪  ")
+
+
+def nested_quantifiers(pattern: str) -> bool:
+    # a variable repeat inside a repeat like (a+)+, (\w*\s?)* or (.*a){10} can try exponentially many ways to split
+    # a text that almost matches, and so can alternatives that start the same way like (a|aa)+.
+    # possessive repeats and atomic groups never give back what they matched.
+    try:
+        parsed = sre_parse.parse(pattern, IGNORECASE | UNICODE)
+    except Exception:
+        return False
+    return _walk(parsed, False)
+
+
+def _walk(items, repeated: bool) -> bool:
+    for op, av in items:
+        if op in _REPEATS:
+            minimum, maximum, item = av
+            variable = minimum != maximum
+            if repeated and variable:
+                return True
+            if _walk(item, repeated or maximum > 1):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _walk(av[-1], repeated):
+                return True
+        elif op is sre_parse.BRANCH:
+            if repeated and _ambiguous(av[1]):
+                return True
+            if any(_walk(branch, repeated) for branch in av[1]):
+                return True
+        elif op is sre_parse.ASSERT or op is sre_parse.ASSERT_NOT:
+            if _walk(av[1], repeated):
+                return True
+    return False
+
+
+def _ambiguous(branches: list) -> bool:
+    # the parser already turns a|aa into a(?:|a) and \w|\d into [\w\d], what is left is ambiguous if a branch
+    # can be empty, which is an optional part like a?, or if two branches can start with the same character.
+    firsts = []
+    for branch in branches:
+        atoms, empty = _first(branch)
+        if empty:
+            return True
+        firsts.append(atoms)
+    for index, atoms in enumerate(firsts):
+        for others in firsts[index + 1:]:
+            if any(_accepts(atom, character) and _accepts(other, character)
+                   for character in _ALPHABET for atom in atoms for other in others):
+                return True
+    return False
+
+
+def _first(items) -> tuple:
+    # returns (atoms, empty): the single character elements a match of the sequence can start with,
+    # and whether the sequence can match an empty string.
+    atoms = []
+    for op, av in items:
+        if op in _ZERO_WIDTH:
+            continue
+        if op in _CHARACTERS:
+            atoms.append((op, av))
+            return atoms, False
+        if op is sre_parse.SUBPATTERN:
+            item_atoms, empty = _first(av[-1])
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            item_atoms, empty = _first(av)
+        elif op is sre_parse.BRANCH:
+            item_atoms = []
+            empty = False
+            for branch in av[1]:
+                branch_atoms, branch_empty = _first(branch)
+                item_atoms += branch_atoms
+                empty = empty or branch_empty
+        elif op in _REPEATS or op is getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+            item_atoms, empty = _first(av[2])
+            empty = empty or av[0] == 0
+        else:
+            # back references and the like can start with anything.
+            atoms.append((sre_parse.ANY, None))
+            return atoms, False
+        atoms += item_atoms
+        if not empty:
+            return atoms, False
+    return atoms, True
+
+
+def _accepts(atom: tuple, character: str) -> bool:
+    op, av = atom
+    if op is sre_parse.ANY:
+        return character != "\n"
+    if op is sre_parse.LITERAL:
+        return _same(av, character)
+    if op is sre_parse.NOT_LITERAL:
+        return not _same(av, character)
+    negate = False
+    found = False
+    for item_op, item_av in av:
+        if item_op is sre_parse.NEGATE:
+            negate = True
+        elif item_op is sre_parse.LITERAL:
+            found = found or _same(item_av, character)
+        elif item_op is sre_parse.RANGE:
+            found = found or any(item_av[0] <= ord(case) <= item_av[1] for case in _cases(character))
+        elif item_op is sre_parse.CATEGORY:
+            category = _CATEGORIES.get(str(item_av))
+            found = found or category is None or category.match(character) is not None
+        else:
+            found = True
+    return found != negate
+
+
+def _same(code: int, character: str) -> bool:
+    return chr(code) in _cases(character) or character in _cases(chr(code))
+
+
+def _cases(character: str) -> set:
+    return {case for case in (character, character.lower(), character.upper()) if len(case) == 1}
@@ -0,0 +1,109 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def available() -> bool:
+    return numpy is not None
+
+
+class Batch(object):
+    # the columns of several subtitles concatenated into flat arrays, every block knows where its subtitle starts
+    # and stops so windows never reach into another subtitle.
+    matches: "numpy.ndarray"
+    start_times: "numpy.ndarray"
+    stop_times: "numpy.ndarray"
+    offsets: list
+    index: "numpy.ndarray"
+    starts: "numpy.ndarray"
+    stops: "numpy.ndarray"
+    lengths: "numpy.ndarray"
+
+    def __init__(self, subtitles: list):
+        lengths = [len(subtitle) for subtitle in subtitles]
+        self.offsets = [0]
+        for length in lengths:
+            self.offsets.append(self.offsets[-1] + length)
+        self.matches = numpy.concatenate([numpy.frombuffer(subtitle.regex_matches, dtype=numpy.int32)
+                                          for subtitle in subtitles]).astype(numpy.int64)
+        self.start_times = numpy.concatenate([numpy.frombuffer(subtitle.start_times, dtype=numpy.int64)
+                                              for subtitle in subtitles])
+        self.stop_times = numpy.concatenate([numpy.frombuffer(subtitle.stop_times, dtype=numpy.int64)
+                                             for subtitle in subtitles])
+        self.index = numpy.arange(len(self.matches))
+        self.lengths = numpy.repeat(numpy.array(lengths, dtype=numpy.int64), lengths)
+        self.starts = numpy.repeat(numpy.array(self.offsets[:-1], dtype=numpy.int64), lengths)
+        self.stops = self.starts + self.lengths
+
+    def neighbor_pass(self, window: int, threshold: int, include_self: bool, edges: int, min_blocks: int) -> None:
+        # same result as Cleaner._neighbor_pass on every subtitle with at least min_blocks blocks.
+        # that loop raises blocks in place, so a raised block can make the next one reach the threshold. a block
+        # just below threshold is raised, and so reaches it, if an earlier block within window did. those blocks
+        # form chains of gaps no longer than window, and everything in a chain after its first block that reaches
+        # the threshold on its own reaches it as well.
+        matches = self.matches
+        index = self.index
+        starts = self.starts
+        stops = self.stops
+        active = self.lengths >= min_blocks
+
+        flags = matches >= threshold
+        flag_sum = numpy.concatenate(([0], numpy.cumsum(flags)))
+        right = flag_sum[numpy.minimum(index + window + 1, stops)] - flag_sum[index + (0 if include_self else 1)]
+        forced = (index - starts < edges) | (stops - index <= edges)
+
+        candidates = active & (matches == threshold - 1)
+        seeds = active & (flags | (candidates & (forced | (right > 0))))
+        potential = numpy.flatnonzero(seeds | candidates)
+        final_flags = numpy.zeros(len(matches), dtype=bool)
+        if len(potential) > 0:
+            breaks = numpy.ones(len(potential), dtype=bool)
+            breaks[1:] = (numpy.diff(potential) > window) | (starts[potential[1:]] != starts[potential[:-1]])
+            chain = numpy.cumsum(breaks) - 1
+            potential_seeds = seeds[potential]
+            seed_sum = numpy.cumsum(potential_seeds)
+            chain_begin = numpy.flatnonzero(breaks)
+            seeds_before_chain = seed_sum[chain_begin] - potential_seeds[chain_begin]
+            final_flags[potential[seed_sum - seeds_before_chain[chain] > 0]] = True
+
+        final_sum = numpy.concatenate(([0], numpy.cumsum(final_flags)))
+        left = final_sum[index] - final_sum[numpy.maximum(index - window, starts)]
+        self.matches = matches + (active & (forced | (right > 0) | (left > 0)))
+
+    def find_ads(self) -> tuple:
+        # same classification as Cleaner.find_ads, returns (ad mask, warning mask).
+        matches = self.matches
+        index = self.index
+        starts = self.starts
+        last = self.stops - 1
+        pre = numpy.maximum(index - 1, starts)
+        post = numpy.minimum(index + 1, last)
+        close_before = (self.start_times - self.stop_times[pre]) < 1000
+        close_after = (self.start_times[post] - self.stop_times) < 1000
+
+        high = matches >= 3
+        ads = high.copy()
+        warnings = matches == 2
+        rest = ~(high | warnings)
+        first = index == starts
+        final = (index == last) & ~first
+        middle = ~(first | final)
+
+        neighbor = rest & first & high[post]
+        ads |= neighbor & close_after
+        warnings |= neighbor & ~close_after
+        neighbor = rest & final & high[pre]
+        ads |= neighbor & close_before
+        warnings |= neighbor & ~close_before
+        neighbor = rest & middle & high[pre] & high[post]
+        ads |= neighbor & close_before & close_after
+        warnings |= neighbor & ~(close_before & close_after)
+        return ads, warnings
+
+    def results(self, number: int, ads: "numpy.ndarray", warnings: "numpy.ndarray") -> tuple:
+        # (regex matches, ad indices, warning indices) of the number-th subtitle.
+        start = self.offsets[number]
+        stop = self.offsets[number + 1]
+        return (self.matches[start:stop].tolist(), numpy.flatnonzero(ads[start:stop]).tolist(),
+                numpy.flatnonzero(warnings[start:stop]).tolist())
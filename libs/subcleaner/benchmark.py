@@ -0,0 +1,158 @@
+from timeit import timeit, repeat
+from argparse import ArgumentParser
+from pathlib import Path
+from datetime import timedelta
+from math import floor
+
+from .timestamp import parse_timestamp, format_timestamp
+from .subtitle import Subtitle
+from .cleaner import Cleaner
+from .rule_set import RuleSet
+from .engines import available_engines, save_choice
+from . import main as subcleaner
+
+# run from the script directory with: python3 -m libs.subcleaner.benchmark
+# or to pick regex engines for regex_engine = auto: python3 -m libs.subcleaner.benchmark --engines <library>
+
+_SAMPLE_TIMESTAMPS = ["00:00:01,326", "00:12:09,584", "01:29:30,709", "02:03:59,999", "00:00:00,000"]
+
+
+def convert_to_timedelta(time) -> timedelta:
+    # how SubBlock parsed timestamps before parse_timestamp, kept as the benchmark baseline.
+    time = time.replace(",", ".").replace(" ", "")
+    split = time.split(":")
+
+    return timedelta(hours=float(split[0]),
+                     minutes=float(split[1]),
+                     seconds=float(split[2]))
+
+
+def convert_from_timedelta(time: timedelta) -> str:
+    # how SubBlock formatted timestamps before format_timestamp, kept as the benchmark baseline.
+    time_left = time.total_seconds()
+
+    hours = floor(time_left / (60 * 60))
+    time_left = time_left - hours * (60 * 60)
+
+    minutes = floor(time_left / 60)
+    time_left = time_left - minutes * 60
+
+    seconds = floor(time_left)
+    time_left = time_left - seconds
+
+    mill = floor(time_left * 1000)
+
+    hours_str = str(hours)
+    minutes_str = str(minutes)
+    seconds_str = str(seconds)
+    mill_str = str(mill)
+
+    hours_str = "0" * (2 - len(hours_str)) + hours_str
+    minutes_str = "0" * (2 - len(minutes_str)) + minutes_str
+    seconds_str = "0" * (2 - len(seconds_str)) + seconds_str
+    mill_str = "0" * (3 - len(mill_str)) + mill_str
+
+    return hours_str + ":" + minutes_str + ":" + seconds_str + "," + mill_str
+
+
+def timestamp_benchmark(number: int = 20000) -> list:
+    samples = _SAMPLE_TIMESTAMPS
+    times = [parse_timestamp(sample) for sample in samples]
+    deltas = [convert_to_timedelta(sample) for sample in samples]
+
+    results = [
+        ("parse: convert_to_timedelta",
+         timeit(lambda: [convert_to_timedelta(sample) for sample in samples], number=number)),
+        ("parse: parse_timestamp",
+         timeit(lambda: [parse_timestamp(sample) for sample in samples], number=number)),
+        ("format: convert_from_timedelta",
+         timeit(lambda: [convert_from_timedelta(delta) for delta in deltas], number=number)),
+        ("format: format_timestamp",
+         timeit(lambda: [format_timestamp(time) for time in times], number=number)),
+    ]
+    return [(name, seconds / (number * len(samples)) * 1e9) for name, seconds in results]
+
+
+def load_corpus(library: Path) -> dict:
+    # normalized block texts of every subtitle under library, by language.
+    corpus = dict()
+    for file in sorted(library.rglob("*.srt")):
+        try:
+            subtitle = Subtitle(file, None, None)
+        except UnicodeDecodeError:
+            continue
+        subtitle.determine_language()
+        texts = corpus.setdefault(subtitle.language, [])
+        for index in range(len(subtitle)):
+            texts.append(Cleaner._normalize(subtitle.content(index)))
+    return corpus
+
+
+def engine_benchmark(cleaner: Cleaner, corpus: dict, number: int = 3) -> dict:
+    # returns {language: [(engine, seconds)]}, engines that score any block differently than re are left out.
+    results = dict()
+    for language, texts in corpus.items():
+        if language not in cleaner.language_rules:
+            cleaner._add_language(language)
+        purge_regex, warning_regex, purge_keywords, warning_keywords = cleaner.language_rules[language]
+        reference = None
+        results[language] = []
+        for engine in available_engines():
+            rule_set = RuleSet(purge_regex, warning_regex, None, purge_keywords, warning_keywords, engine)
+            scores = [rule_set.score(text) for text in texts]
+            if reference is None:
+                reference = scores
+            elif scores != reference:
+                continue
+            seconds = min(repeat(lambda: [rule_set.score(text) for text in texts], number=1, repeat=number))
+            results[language].append((engine, seconds))
+    return results
+
+
+def choose_engines(results: dict) -> dict:
+    choice = dict()
+    totals = dict()
+    for language, timings in results.items():
+        if len(timings) == 0:
+            continue
+        choice[language] = min(timings, key=lambda timing: timing[1])[0]
+        for engine, seconds in timings:
+            totals.setdefault(engine.name, [engine, 0.0])[1] += seconds
+    # engines missing from a language disagreed with re there and can't be the default.
+    complete = [total for total in totals.values() if all(any(engine.name == total[0].name for engine, _ in timings)
+                                                          for timings in results.values() if len(timings) > 0)]
+    if len(complete) > 0:
+        choice[""] = min(complete, key=lambda total: total[1])[0]
+    return choice
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Benchmarks for subcleaner.")
+    parser.add_argument("--engines", metavar="LIB", type=str, dest="engines", default=None,
+                        help="Time every installed regex engine on the subtitles under LIB with the configured "
+                             "regexes and save the fastest for regex_engine = auto.")
+    args = parser.parse_args()
+
+    if args.engines is None:
+        print("timestamp codec (ns per timestamp):")
+        for name, nanoseconds in timestamp_benchmark():
+            print("    " + name.ljust(45) + ("%.0f" % nanoseconds).rjust(8))
+        return
+
+    subcleaner.package_dir = Path.cwd()
+    subcleaner.parse_config()
+    corpus = load_corpus(Path(args.engines))
+    results = engine_benchmark(subcleaner.cleaner, corpus)
+    print("regex engines (ms per run over all blocks):")
+    for language, timings in results.items():
+        print("    " + language + " (" + str(len(corpus[language])) + " blocks):")
+        for engine, seconds in timings:
+            print("        " + engine.name.ljust(10) + ("%.1f" % (seconds * 1000)).rjust(10))
+
+    choice = choose_engines(results)
+    save_choice(subcleaner.package_dir.joinpath(".regex_engine.json"), choice)
+    print("picked: " + ", ".join((language or "default") + ": " + engine.name for language, engine in choice.items()))
+
+
+if __name__ == "__main__":
+    main()
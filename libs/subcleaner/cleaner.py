@@ -1,159 +1,497 @@
 from configparser import ConfigParser
 from pathlib import Path
+from os import replace
+from tempfile import mkstemp
+import json
 
 from .subtitle import Subtitle
-from .sub_block import SubBlock
-from re import findall, IGNORECASE, UNICODE
-from datetime import timedelta
+from .rule_set import RuleSet
+from .backtracking import nested_quantifiers
+from .rule_stats import RuleStats
+from .engines import Engine, ReEngine
+from .batch import Batch
+from . import batch
+from bisect import bisect_left
+from collections import OrderedDict
+from array import array
+
+# bump when the snapshot layout or the way rules are resolved changes.
+SNAPSHOT_VERSION = 3
+# rule sections a regex config can have, every language resolves to one rule list per section.
+SECTIONS = ("PURGE_REGEX", "WARNING_REGEX", "PURGE_KEYWORDS", "WARNING_KEYWORDS")
 
 
 class Cleaner(object):
-    purge_regex: dict
-    warning_regex: dict
+    language_rules: dict
+    rule_sets: dict
+    shared_rule_sets: dict
+    checked_patterns: set
+    disabled_patterns: set
     exclusive_configs: list
-
-    def __init__(self, regex_dir: Path, use_default_regex: bool):
+    exclusive_rules: list
+    whole_file: bool
+    rule_budget: float
+    stats: RuleStats
+    score_cache: OrderedDict
+    cache_size: int
+    cache_hits: int
+    cache_misses: int
+    engine: Engine
+    language_engines: dict
+    neighbor_window: int
+    cluster_window: int
+    zones: tuple
+
+    def __init__(self, regex_dir: Path, use_default_regex: bool, whole_file: bool = False, snapshot: Path = None,
+                 rule_budget: float = None, cache_size: int = 10000, engine: Engine = None,
+                 language_engines: dict = None, neighbor_window: int = 1, cluster_window: int = 15,
+                 zones: tuple = None):
         self.exclusive_configs = list()
-        self._build_regex(regex_dir, use_default_regex)
+        self.rule_sets = dict()
+        # keyed by the rule tuples of every section and the engine, languages with the same rules share a RuleSet.
+        self.shared_rule_sets = dict()
+        self.checked_patterns = set()
+        # patterns a rule set disabled for running over the time budget, each is only reported once.
+        self.disabled_patterns = set()
+        self.whole_file = whole_file
+        # seconds a single rule may spend on one subtitle before it's left out for the rest of it, None for no limit.
+        self.rule_budget = rule_budget
+        self.stats = None
+        # raw regex scores of recently seen blocks, keyed by rule set and normalized text.
+        self.score_cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # regex engine for every language, unless the benchmark picked another one for it.
+        self.engine = engine or ReEngine()
+        self.language_engines = language_engines or dict()
+        # how many blocks to each side count as neighbors in the two passes that raise blocks near ads.
+        self.neighbor_window = neighbor_window
+        self.cluster_window = cluster_window
+        # (head, tail) in milliseconds, blocks between the two zones only get the rules if the prefilter hits.
+        # None scans every block with every rule.
+        self.zones = zones
+        self._build_regex(regex_dir, use_default_regex, snapshot)
 
     def run_regex(self, subtitle: Subtitle) -> None:
-        blocks = subtitle.blocks
+        self.score_blocks(subtitle)
+        self.propagate(subtitle)
+
+    def score_blocks(self, subtitle: Subtitle) -> None:
+        matches = subtitle.regex_matches
+        block_count = len(subtitle)
+
+        if subtitle.start_times[0] < 2000:
+            matches[0] = 3
+
+        rule_set = self._rule_set(subtitle.language)
+        rule_set.reset_budget()
+        quarantined = len(rule_set.quarantined)
+        middle = self._middle(subtitle)
+        if self.stats is not None:
+            self._profiled_regex(subtitle, rule_set, middle)
+        elif self.whole_file:
+            self._whole_file_regex(subtitle, rule_set, middle)
+        else:
+            for index in range(block_count):
+                content = subtitle.content(index)
+                if len(content.strip(" -_.")) <= 1:
+                    matches[index] = 3
+                    continue
+                if matches[index] >= 3:
+                    # already an ad, no regex can change that.
+                    continue
 
-        if subtitle.blocks[0].start_time < timedelta(seconds=2):
-            subtitle.blocks[0].regex_matches = 3
+                matches[index] += self._block_regex(content, rule_set, index in middle)
 
-        for block in blocks:
-            if len(block.content.strip(" -_.")) <= 1:
-                block.regex_matches = 3
-                continue
+                if matches[index] == 0:
+                    matches[index] = -1
 
-            if subtitle.language not in self.purge_regex:
-                self._add_language(subtitle.language)
+        for rule in rule_set.quarantined[quarantined:]:
+            if rule.pattern in self.disabled_patterns:
+                continue
+            self.disabled_patterns.add(rule.pattern)
+            print("WARN: regex " + rule.config + " [" + rule.key + "] ran over the time budget on " +
+                  str(rule_set.strikes[rule]) + " subtitles, the last one \"" + str(subtitle.file) +
+                  "\", and is disabled for the rest of this run: " + rule.pattern)
+        rule_set.reorder()
+
+    def propagate(self, subtitle: Subtitle) -> None:
+        matches = subtitle.regex_matches
+        block_count = len(subtitle)
+
+        if block_count >= 10:
+            self._neighbor_pass(matches, self.neighbor_window, 2, False, 3)
+
+        if block_count >= 100:
+            self._neighbor_pass(matches, self.cluster_window, 3, True)
+
+    def classify(self, subtitles: list) -> None:
+        # propagate and find_ads for subtitles that have been through score_blocks,
+        # with numpy installed all of them are done at once as array operations.
+        if not batch.available() or len(subtitles) == 0:
+            for subtitle in subtitles:
+                self.propagate(subtitle)
+                self.find_ads(subtitle)
+            return
 
-            self._block_regex(block, self.purge_regex[subtitle.language], 3)
-            self._block_regex(block, self.warning_regex[subtitle.language], 1)
+        columns = Batch(subtitles)
+        columns.neighbor_pass(self.neighbor_window, 2, False, 3, 10)
+        columns.neighbor_pass(self.cluster_window, 3, True, 0, 100)
+        ads, warnings = columns.find_ads()
+        for number, subtitle in enumerate(subtitles):
+            matches, ad_indices, warning_indices = columns.results(number, ads, warnings)
+            subtitle.regex_matches = array("i", matches)
+            for index in ad_indices:
+                subtitle.ad_blocks.append(subtitle.block(index))
+            subtitle.warning_blocks += warning_indices
 
-            if block.regex_matches == 0:
-                block.regex_matches = -1
+    @staticmethod
+    def _neighbor_pass(matches: array, window: int, threshold: int, include_self: bool, edges: int = 0) -> None:
+        # raises every block with a block at or above threshold within window of it, and the first and last edges
+        # blocks unconditionally. blocks are raised in place, so a block sees the raised values of the blocks
+        # before it and the old values of the blocks after it. flagged counts the blocks in the window at or above
+        # threshold and is kept up to date as the window slides.
+        block_count = len(matches)
+        flagged = 0
+        for neighbor in range(min(window + 1, block_count)):
+            if matches[neighbor] >= threshold:
+                flagged += 1
+
+        for index in range(block_count):
+            was_flagged = matches[index] >= threshold
+            if index < edges or index >= block_count - edges:
+                matches[index] += 1
+            elif flagged - (0 if include_self or not was_flagged else 1) > 0:
+                matches[index] += 1
+            if not was_flagged and matches[index] >= threshold:
+                flagged += 1
+
+            if index - window >= 0 and matches[index - window] >= threshold:
+                flagged -= 1
+            if index + window + 1 < block_count and matches[index + window + 1] >= threshold:
+                flagged += 1
+
+    def _middle(self, subtitle: Subtitle) -> range:
+        # blocks that start after the head zone and before the tail zone, found by bisecting the start times.
+        if self.zones is None:
+            return range(0)
+        head, tail = self.zones
+        start_times = subtitle.start_times
+        first = bisect_left(start_times, head)
+        last = bisect_left(start_times, subtitle.stop_times[-1] - tail)
+        return range(first, max(first, last))
+
+    def _block_regex(self, content: str, rule_set: RuleSet, screened: bool = False) -> int:
+        text = self._normalize(content)
+        if screened and not rule_set.escalates(text):
+            return 0
+        if self.cache_size <= 0:
+            return rule_set.score(text)
+        key = self._cache_key(rule_set, text)
+        score = self._cached_score(key)
+        if score is None:
+            score = rule_set.score(text)
+            self._cache_score(key, score)
+        return score
+
+    def _whole_file_regex(self, subtitle: Subtitle, rule_set: RuleSet, middle: range) -> None:
+        matches = subtitle.regex_matches
+        texts = []
+        indices = []
+        for index in range(len(subtitle)):
+            content = subtitle.content(index)
+            if len(content.strip(" -_.")) <= 1:
+                matches[index] = 3
+                continue
+            if matches[index] >= 3:
+                continue
+            text = self._normalize(content)
+            if index in middle and not rule_set.escalates(text):
+                if matches[index] == 0:
+                    matches[index] = -1
+                continue
+            if self.cache_size > 0:
+                score = self._cached_score(self._cache_key(rule_set, text))
+                if score is not None:
+                    matches[index] += score
+                    if matches[index] == 0:
+                        matches[index] = -1
+                    continue
+            texts.append(text)
+            indices.append(index)
+
+        for index, text, score in zip(indices, texts, rule_set.score_all(texts)):
+            if self.cache_size > 0:
+                self._cache_score(self._cache_key(rule_set, text), score)
+            matches[index] += score
+            if matches[index] == 0:
+                matches[index] = -1
+
+    def summary(self) -> str:
+        lines = []
+        if self.cache_hits + self.cache_misses > 0:
+            lines.append("Regex score cache: " + str(self.cache_hits) + " hits, " + str(self.cache_misses) + " misses.")
+        for rule_set in {id(rule_set): rule_set for rule_set in self.rule_sets.values()}.values():
+            runs = sum(rule.runs for rule in rule_set.rules)
+            if runs == 0:
+                continue
+            languages = ", ".join(sorted(language for language in self.rule_sets
+                                         if self.rule_sets[language] is rule_set))
+            lines.append("Regex order [" + languages + "] (" + rule_set.engine.name + "): " + str(runs) +
+                         " evaluations, " + str(rule_set.skipped) + " skipped on decided blocks. First: " +
+                         ", ".join(rule.config + " [" + rule.key + "]" for rule in rule_set.rules[:3]) + ".")
+        return "\n".join(lines)
 
-        if len(blocks) >= 10:
-            for index in range(0, len(subtitle.blocks)):
+    @staticmethod
+    def _cache_key(rule_set: RuleSet, text: str) -> tuple:
+        # a rule set loses rules when they run over the time budget, scores from without them don't apply.
+        return rule_set, len(rule_set.quarantined), tuple(rule_set.suspended), text
+
+    def _cached_score(self, key: tuple) -> int:
+        score = self.score_cache.get(key)
+        if score is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        self.score_cache.move_to_end(key)
+        return score
+
+    def _cache_score(self, key: tuple, score: int) -> None:
+        self.score_cache[key] = score
+        if len(self.score_cache) > self.cache_size:
+            self.score_cache.popitem(last=False)
+
+    def _profiled_regex(self, subtitle: Subtitle, rule_set: RuleSet, middle: range) -> None:
+        # same scores as the other paths, but every rule is run and timed on its own.
+        matches = subtitle.regex_matches
+        for rule in rule_set.rules + rule_set.keywords.rules:
+            self.stats.stat(rule)
+        for index in range(len(subtitle)):
+            content = subtitle.content(index)
+            if len(content.strip(" -_.")) <= 1:
+                matches[index] = 3
+                continue
 
-                if index < 3 or index > len(subtitle.blocks) - 4:
-                    subtitle.blocks[index].regex_matches += 1
-                    continue
-                for block in subtitle.blocks[max(0, index - 1): min(index + 2, len(subtitle.blocks))]:
-                    if block.regex_matches >= 2 and index != block.index - 1:
-                        subtitle.blocks[index].regex_matches += 1
-                        break
-
-        if len(blocks) >= 100:
-            for index in range(0, len(subtitle.blocks)):
-                for block in subtitle.blocks[max(0, index - 15): min(index + 16, len(subtitle.blocks))]:
-                    if block.regex_matches >= 3:
-                        subtitle.blocks[index].regex_matches += 1
-                        break
+            text = self._normalize(content)
+            details = rule_set.score_detail(text) if index not in middle or rule_set.escalates(text) else []
+            for rule, count, elapsed in details:
+                matches[index] += rule.punishment * count
+                stat = self.stats.stat(rule)
+                stat.blocks += 1
+                stat.matches += count
+                stat.elapsed += elapsed
+            for rule, count, elapsed in details:
+                if count > 0 and matches[index] - rule.punishment * count < 3 <= matches[index]:
+                    self.stats.stat(rule).tipped += 1
+
+            if matches[index] == 0:
+                matches[index] = -1
 
     @staticmethod
-    def _block_regex(block: SubBlock, regex_list: list, punishment: int) -> None:
-        clean_content: str = " ".join(block.content.replace("-\n", "-").split())
-        for regex in regex_list:
-            result = findall(regex, clean_content, flags=IGNORECASE | UNICODE)
-            if result is not None and len(result) > 0:
-                block.regex_matches += punishment * len(result)
+    def _normalize(content: str) -> str:
+        return " ".join(content.replace("-\n", "-").split())
+
+    def _rule_set(self, language: str) -> RuleSet:
+        if language not in self.rule_sets:
+            if language not in self.language_rules:
+                self._add_language(language)
+            engine = self.language_engines.get(language, self.engine)
+            rules = (self.language_rules[language], engine.name)
+            if rules not in self.shared_rule_sets:
+                purge_regex, warning_regex, purge_keywords, warning_keywords = rules[0]
+                rule_set = RuleSet(purge_regex, warning_regex, self.rule_budget, purge_keywords, warning_keywords,
+                                   engine)
+                for rule in rule_set.rules:
+                    if rule.pattern in self.checked_patterns:
+                        continue
+                    self.checked_patterns.add(rule.pattern)
+                    if nested_quantifiers(rule.pattern):
+                        print("WARN: regex " + rule.config + " [" + rule.key + "] has nested quantifiers and can "
+                              "take exponential time on some text: " + rule.pattern)
+                self.shared_rule_sets[rules] = rule_set
+            self.rule_sets[language] = self.shared_rule_sets[rules]
+        return self.rule_sets[language]
 
     @staticmethod
     def remove_ads(subtitle: Subtitle):
-        for block in subtitle.ad_blocks:
-            subtitle.remove_block(block)
-        for index in range(len(subtitle.blocks)):
-            block: SubBlock = subtitle.blocks[index]
-            block.index = index + 1
+        if len(subtitle.ad_blocks) > 0:
+            subtitle.changed = True
+        ad_indices = sorted(block.index - 1 for block in subtitle.ad_blocks)
+        subtitle.remove_blocks(set(ad_indices))
+        # blocks are numbered when written, warnings only need to know how many ads preceded them.
+        subtitle.warning_blocks = [index - bisect_left(ad_indices, index) for index in subtitle.warning_blocks]
 
     @staticmethod
     def find_ads(subtitle: Subtitle) -> None:
-
-        for index in range(0, len(subtitle.blocks)):
-            block: SubBlock = subtitle.blocks[index]
-
-            if block.regex_matches >= 3:
-                subtitle.ad_blocks.append(block)
+        matches = subtitle.regex_matches
+        start_times = subtitle.start_times
+        stop_times = subtitle.stop_times
+        last = len(subtitle) - 1
+
+        for index in range(0, last + 1):
+            if matches[index] >= 3:
+                subtitle.ad_blocks.append(subtitle.block(index))
                 continue
-            elif block.regex_matches == 2:
-                subtitle.warning_blocks.append(block)
+            elif matches[index] == 2:
+                subtitle.warning_blocks.append(index)
                 continue
 
-            pre_block: SubBlock = subtitle.blocks[max(index - 1, 0)]
-            post_block: SubBlock = subtitle.blocks[min(index + 1, len(subtitle.blocks)-1)]
+            pre = max(index - 1, 0)
+            post = min(index + 1, last)
 
             if index == 0:
-                if post_block.regex_matches >= 3:
-                    if (post_block.start_time - block.stop_time) < timedelta(seconds=1):
-                        subtitle.ad_blocks.append(block)
+                if matches[post] >= 3:
+                    if (start_times[post] - stop_times[index]) < 1000:
+                        subtitle.ad_blocks.append(subtitle.block(index))
                         continue
                     else:
-                        subtitle.warning_blocks.append(block)
+                        subtitle.warning_blocks.append(index)
                         continue
 
-            elif index == len(subtitle.blocks) - 1:
-                if pre_block.regex_matches >= 3:
-                    if (block.start_time - pre_block.stop_time) < timedelta(seconds=1):
-                        subtitle.ad_blocks.append(block)
+            elif index == last:
+                if matches[pre] >= 3:
+                    if (start_times[index] - stop_times[pre]) < 1000:
+                        subtitle.ad_blocks.append(subtitle.block(index))
                         continue
                     else:
-                        subtitle.warning_blocks.append(block)
+                        subtitle.warning_blocks.append(index)
                         continue
 
-            elif pre_block.regex_matches >= 3 and post_block.regex_matches >= 3:
-                if (post_block.start_time - block.stop_time) < timedelta(seconds=1) and \
-                        (block.start_time - pre_block.stop_time) < timedelta(seconds=1):
-                    subtitle.ad_blocks.append(block)
+            elif matches[pre] >= 3 and matches[post] >= 3:
+                if (start_times[post] - stop_times[index]) < 1000 and \
+                        (start_times[index] - stop_times[pre]) < 1000:
+                    subtitle.ad_blocks.append(subtitle.block(index))
                     continue
-                if block.regex_matches == 2:
-                    subtitle.ad_blocks.append(block)
+                if matches[index] == 2:
+                    subtitle.ad_blocks.append(subtitle.block(index))
                     continue
                 else:
-                    subtitle.warning_blocks.append(block)
+                    subtitle.warning_blocks.append(index)
                     continue
 
     @staticmethod
     def fix_overlap(subtitle: Subtitle) -> None:
-        if len(subtitle.blocks) < 2:
+        if len(subtitle) < 2:
             return
 
-        margin: timedelta = timedelta(seconds=0.0417)
-        previous_block: SubBlock = subtitle.blocks[0]
-        for block in subtitle.blocks[1:]:
-            block: SubBlock
-            stop_time: timedelta = previous_block.stop_time + margin
-            start_time: timedelta = block.start_time - margin
-            overlap: timedelta = stop_time - start_time
-            if overlap.days >= 0 and overlap.microseconds > 3000:
-                content_ratio = len(block.content) / (len(block.content) + len(previous_block.content))
-                block.start_time += content_ratio * overlap
-                previous_block.stop_time += (content_ratio - 1) * overlap
-            previous_block = block
+        start_times = subtitle.start_times
+        stop_times = subtitle.stop_times
+
+        # overlap is measured in microseconds so the 41.7 ms margin stays exact.
+        margin: int = 41700
+        for index in range(1, len(subtitle)):
+            previous = index - 1
+            overlap: int = (stop_times[previous] - start_times[index]) * 1000 + 2 * margin
+            if overlap >= 0 and overlap % 1000000 > 3000:
+                length = len(subtitle.content(index))
+                previous_length = len(subtitle.content(previous))
+                content_ratio = length / (length + previous_length)
+                start_shift = round(content_ratio * overlap) // 1000
+                stop_shift = round((content_ratio - 1) * overlap) // 1000
+                if start_shift != 0:
+                    start_times[index] += start_shift
+                    subtitle.retimed[index] = 1
+                    subtitle.changed = True
+                if stop_shift != 0:
+                    stop_times[previous] += stop_shift
+                    subtitle.retimed[previous] = 1
+                    subtitle.changed = True
         return
 
-    def _build_regex(self, regex_dir: Path, use_default_regex: bool) -> None:
-        self.purge_regex = dict()
-        self.warning_regex = dict()
-        if not regex_dir.is_dir():
+    def _build_regex(self, regex_dir: Path, use_default_regex: bool, snapshot: Path) -> None:
+        self.language_rules = dict()
+        self.exclusive_rules = [[] for _ in SECTIONS]
+        configs = self._discover_configs(regex_dir, use_default_regex)
+
+        key = [SNAPSHOT_VERSION, use_default_regex]
+        for config in configs:
+            stat = config.stat()
+            key.append([str(config), stat.st_size, stat.st_mtime_ns])
+        if snapshot is not None and self._load_snapshot(snapshot, key):
             return
-        if not regex_dir.joinpath("default").is_dir():
-            use_default_regex = False
 
-        if use_default_regex:
-            for default in regex_dir.joinpath("default").iterdir():
-                if default.match("*/[!.]*.conf"):
-                    if not any(default.name.lower() == custom.name.lower() for custom in regex_dir.iterdir()):
-                        self._add_config(default)
+        for config in configs:
+            self._add_config(config)
+        self._add_exclusive_configs()
+        self._share_rule_lists()
 
-        for custom in regex_dir.iterdir():
-            if custom.match("*/[!.]*.conf"):
-                self._add_config(custom)
+        if snapshot is not None:
+            self._save_snapshot(snapshot, key)
 
-        self._add_exclusive_configs()
+    @staticmethod
+    def _discover_configs(regex_dir: Path, use_default_regex: bool) -> list:
+        # every directory is listed once, defaults overridden by a custom config of the same name are skipped.
+        if not regex_dir.is_dir():
+            return []
+        customs = list(regex_dir.iterdir())
+        configs = []
+        default_dir = regex_dir.joinpath("default")
+        if use_default_regex and default_dir.is_dir():
+            custom_names = {custom.name.lower() for custom in customs}
+            for default in default_dir.iterdir():
+                if default.match("*/[!.]*.conf") and default.name.lower() not in custom_names:
+                    configs.append(default)
+
+        for custom in customs:
+            if custom.match("*/[!.]*.conf"):
+                configs.append(custom)
+        return configs
+
+    def _load_snapshot(self, snapshot: Path, key: list) -> bool:
+        try:
+            data = json.loads(snapshot.read_bytes())
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get("key") != key:
+            return False
+
+        # rule lists are stored once and referenced by every language that resolved to them.
+        rule_lists = [tuple(tuple(rule) for rule in rules) for rules in data["rule_lists"]]
+        self.language_rules = {language: tuple(rule_lists[reference] for reference in references)
+                               for language, references in data["languages"].items()}
+        self.exclusive_rules = [list(rule_lists[reference]) for reference in data["exclusive"]]
+        return True
+
+    def _save_snapshot(self, snapshot: Path, key: list) -> None:
+        rule_lists = []
+        references = dict()
+
+        def reference(rules) -> int:
+            rules = tuple(rules)
+            if rules not in references:
+                references[rules] = len(rule_lists)
+                rule_lists.append(rules)
+            return references[rules]
+
+        data = {
+            "key": key,
+            "languages": {language: [reference(rules) for rules in sections]
+                          for language, sections in self.language_rules.items()},
+            "exclusive": [reference(rules) for rules in self.exclusive_rules],
+            "rule_lists": rule_lists,
+        }
+        # the cache is only an optimization, a snapshot that can't be written is rebuilt next run.
+        try:
+            descriptor, temp_name = mkstemp(prefix=snapshot.name + ".", suffix=".tmp", dir=str(snapshot.parent))
+        except OSError:
+            return
+        try:
+            with open(descriptor, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False)
+            replace(temp_name, str(snapshot))
+        except OSError:
+            try:
+                Path(temp_name).unlink()
+            except OSError:
+                pass
+
+    def _share_rule_lists(self) -> None:
+        # languages that resolved to the same rules, like sv, sve and svenska, share one tuple.
+        shared = dict()
+        for language, sections in self.language_rules.items():
+            sections = tuple(shared.setdefault(tuple(rules), tuple(rules)) for rules in sections)
+            self.language_rules[language] = shared.setdefault(sections, sections)
 
     def _add_config(self, regex_config: Path) -> None:
         parser: ConfigParser = ConfigParser()
@@ -163,51 +501,45 @@ class Cleaner(object):
             return
 
         if parser.has_option("META", "language_codes") and len(parser["META"]["language_codes"]) > 0:
-            self._add_inclusive_config(parser)
+            self._add_inclusive_config(regex_config.name, parser)
             return
-        self.exclusive_configs.append(parser)
+        self.exclusive_configs.append((regex_config.name, parser))
+
+    def add_exclusive_config(self, name: str, parser: ConfigParser) -> None:
+        # only applies to languages without a config of their own, same as exclusive configs in the regex dir.
+        self.exclusive_configs.append((name, parser))
+        for rules, section in zip(self.exclusive_rules, SECTIONS):
+            rules += self._read_rules(name, parser, section)
 
-    def _add_inclusive_config(self, parser: ConfigParser) -> None:
+    def _add_inclusive_config(self, name: str, parser: ConfigParser) -> None:
         for language in parser["META"].get("language_codes", "").replace(" ", "").split(","):
             if language == "":
                 continue
-            self.purge_regex.update({language: []})
-            self.warning_regex.update({language: []})
+            self.language_rules.update({language: [[] for _ in SECTIONS]})
+            self._add_rules(language, name, parser)
 
-            if parser.has_section("PURGE_REGEX"):
-                for key, value in parser.items("PURGE_REGEX"):
-                    self.purge_regex[language].append(value)
+    def _add_rules(self, language: str, name: str, parser: ConfigParser) -> None:
+        for rules, section in zip(self.language_rules[language], SECTIONS):
+            rules += self._read_rules(name, parser, section)
 
-            if parser.has_section("WARNING_REGEX"):
-                for key, value in parser.items("WARNING_REGEX"):
-                    self.warning_regex[language].append(value)
+    @staticmethod
+    def _read_rules(name: str, parser: ConfigParser, section: str) -> list:
+        if not parser.has_section(section):
+            return []
+        return [(name, key, value) for key, value in parser.items(section)]
 
     def _add_exclusive_configs(self) -> None:
-        for parser in self.exclusive_configs:
+        for name, parser in self.exclusive_configs:
             excluded_languages = parser["META"].get("excluded_language_codes", "").replace(" ", "").split(",")
             if len(excluded_languages) == 1 and excluded_languages[0] == "":
                 excluded_languages = []
 
-            for language in self.purge_regex:
+            for language in self.language_rules:
                 if not any(language == excluded_language for excluded_language in excluded_languages):
+                    self._add_rules(language, name, parser)
 
-                    if parser.has_section("PURGE_REGEX"):
-                        for key, value in parser.items("PURGE_REGEX"):
-                            self.purge_regex[language].append(value)
-
-                    if parser.has_section("WARNING_REGEX"):
-                        for key, value in parser.items("WARNING_REGEX"):
-                            self.warning_regex[language].append(value)
+            for rules, section in zip(self.exclusive_rules, SECTIONS):
+                rules += self._read_rules(name, parser, section)
 
     def _add_language(self, language: str) -> None:
-        self.purge_regex.update({language: []})
-        self.warning_regex.update({language: []})
-
-        for parser in self.exclusive_configs:
-            if parser.has_section("PURGE_REGEX"):
-                for key, value in parser.items("PURGE_REGEX"):
-                    self.purge_regex[language].append(value)
-
-            if parser.has_section("WARNING_REGEX"):
-                for key, value in parser.items("WARNING_REGEX"):
-                    self.warning_regex[language].append(value)
+        self.language_rules.update({language: tuple(tuple(rules) for rules in self.exclusive_rules)})
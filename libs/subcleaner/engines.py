@@ -0,0 +1,111 @@
+from pathlib import Path
+import json
+import re
+
+try:
+    import regex
+    # without the module installed the regex config directory next to subcleaner.py imports as an empty namespace.
+    if not hasattr(regex, "compile"):
+        regex = None
+except ImportError:
+    regex = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+# texts every pattern is run on before an engine other than re is trusted with it.
+_PROBES = (
+    "Subtitles by ExplosiveSkull - www.OpenSubtitles.org",
+    "Undertexter: Svensk Medietext, åäö ÅÄÖ éè",
+    "ſ İ ı µ K Å straße ǅ",
+    "1080p 720p \\ | © ™ ½ 2½ ¹ ٣",
+    "-Sync & corrections by \"someone\"... ♪",
+    "",
+)
+
+
+class Engine(object):
+    name: str = None
+
+    def compile(self, pattern: str, multiline: bool = False):
+        raise NotImplementedError
+
+    def compatible(self, pattern: str) -> bool:
+        # compiles and finds the same matches as re on the probe texts.
+        try:
+            compiled = self.compile(pattern)
+        except Exception:
+            return False
+        reference = re.compile(pattern, re.IGNORECASE | re.UNICODE)
+        try:
+            for probe in _PROBES:
+                if [match.span() for match in compiled.finditer(probe)] != \
+                        [match.span() for match in reference.finditer(probe)]:
+                    return False
+        except Exception:
+            return False
+        return True
+
+
+class ReEngine(Engine):
+    name = "re"
+
+    def compile(self, pattern: str, multiline: bool = False):
+        return re.compile(pattern, re.IGNORECASE | re.UNICODE | (re.MULTILINE if multiline else 0))
+
+    def compatible(self, pattern: str) -> bool:
+        return True
+
+
+class RegexEngine(Engine):
+    name = "regex"
+
+    def compile(self, pattern: str, multiline: bool = False):
+        # version 0 keeps the re module's behaviour for the few constructs where version 1 differs.
+        return regex.compile(pattern, regex.IGNORECASE | regex.UNICODE | regex.VERSION0 |
+                             (regex.MULTILINE if multiline else 0))
+
+
+class Re2Engine(Engine):
+    name = "re2"
+
+    def compile(self, pattern: str, multiline: bool = False):
+        # inline flags work the same in every re2 binding. \w, \b, \d and \s are ascii only in re2,
+        # patterns where that matters fail the probes and stay on re.
+        return re2.compile(("(?im)" if multiline else "(?i)") + pattern)
+
+
+_ENGINES = {"re": ReEngine, "regex": RegexEngine, "re2": Re2Engine}
+_MODULES = {"re": re, "regex": regex, "re2": re2}
+
+
+def available_engines() -> list:
+    return [engine() for name, engine in _ENGINES.items() if _MODULES[name] is not None]
+
+
+def get_engine(name: str) -> Engine:
+    # returns None for unknown engines and engines that aren't installed.
+    if name not in _ENGINES or _MODULES[name] is None:
+        return None
+    return _ENGINES[name]()
+
+
+def load_choice(choice_file: Path) -> dict:
+    # maps language codes to the engine the benchmark picked for them, "" is the choice for other languages.
+    try:
+        choice = json.loads(choice_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    engines = dict()
+    for language, name in choice.items():
+        engine = get_engine(name)
+        if engine is not None:
+            engines[language] = engine
+    return engines
+
+
+def save_choice(choice_file: Path, choice: dict) -> None:
+    choice_file.write_text(json.dumps({language: engine.name for language, engine in choice.items()}, indent=2),
+                           encoding="utf-8")
@@ -0,0 +1,63 @@
+from re import compile
+
+_TOKEN = compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall(text.casefold())
+
+
+class KeywordRule(object):
+    __slots__ = ("pattern", "phrases", "punishment", "config", "key", "section")
+
+    def __init__(self, keywords: str, punishment: int, config: str, key: str, section: str):
+        self.pattern = keywords
+        # keywords are separated by commas or new lines, a keyword of several words is matched as a phrase.
+        self.phrases = set()
+        for keyword in keywords.replace("\n", ",").split(","):
+            phrase = tuple(tokenize(keyword))
+            if len(phrase) > 0:
+                self.phrases.add(phrase)
+        self.punishment = punishment
+        self.config = config
+        self.key = key
+        self.section = section
+
+    def __repr__(self) -> str:
+        return self.config + " [" + self.key + "]: " + self.pattern
+
+
+class KeywordMatcher(object):
+    __slots__ = ("rules", "phrase_rules", "lengths")
+
+    rules: tuple
+    phrase_rules: dict
+    lengths: tuple
+
+    def __init__(self, rules: tuple):
+        self.rules = rules
+        self.phrase_rules = dict()
+        for rule in rules:
+            for phrase in rule.phrases:
+                self.phrase_rules.setdefault(phrase, []).append(rule)
+        # a lookup per token and phrase length, no matter how many keywords there are.
+        self.lengths = tuple(sorted({len(phrase) for phrase in self.phrase_rules}))
+
+    def counts(self, text: str) -> dict:
+        counts = dict()
+        if len(self.phrase_rules) == 0:
+            return counts
+        tokens = tokenize(text)
+        for start in range(len(tokens)):
+            for length in self.lengths:
+                if start + length > len(tokens):
+                    break
+                rules = self.phrase_rules.get(tuple(tokens[start:start + length]))
+                if rules is None:
+                    continue
+                for rule in rules:
+                    counts[rule] = counts.get(rule, 0) + 1
+        return counts
+
+    def score(self, text: str) -> int:
+        return sum(rule.punishment * count for rule, count in self.counts(text).items())
@@ -2,9 +2,22 @@ from glob import glob
 from pathlib import Path
 from argparse import ArgumentParser
 from configparser import ConfigParser
+from codecs import lookup
 from .cleaner import Cleaner
+from .rule_stats import RuleStats
+from .engines import ReEngine, get_engine, load_choice
 from .subtitle import Subtitle
+from . import batch
 from datetime import datetime
+from os import fsync, replace
+try:
+    from os import chown
+except ImportError:
+    # windows has no file owners to keep.
+    chown = None
+from shutil import copymode
+from tempfile import mkstemp
+from typing import Iterable, Iterator
 
 cleaner: Cleaner
 relative_base: Path
@@ -20,6 +33,11 @@ silent: bool
 no_log: bool
 regex_defaults: bool
 fix_overlaps: bool
+use_mmap: bool
+fallback_encodings: list
+rule_stats: bool
+rule_stats_json: Path
+batch_size: int
 
 
 def main(package_dir_from: Path):
@@ -29,25 +47,57 @@ def main(package_dir_from: Path):
     parse_config()
     parse_args()
 
-    if len(subtitles) != 0:
-        for file in subtitles:
-            clean_file(file)
+    if rule_stats or rule_stats_json is not None:
+        cleaner.stats = RuleStats()
 
-    if destroy_list is not None:
-        return
+    if len(subtitles) != 0:
+        clean_files(subtitles)
 
-    if len(libraries) != 0:
+    if destroy_list is None and len(libraries) != 0:
         for library in libraries:
             clean_directory(library)
 
+    if cleaner.stats is not None:
+        report_rule_stats()
+
+    summary = cleaner.summary()
+    if not silent and summary:
+        print(summary)
+
 
-def clean_file(subtitle_file: Path) -> None:
+def report_rule_stats() -> None:
+    if rule_stats:
+        print(cleaner.stats.table())
+    if rule_stats_json is not None:
+        cleaner.stats.dump(rule_stats_json)
 
+
+def clean_files(files: Iterable[Path], skipped: tuple = ()) -> None:
+    # subtitles are scored one by one but classified a batch at a time, without numpy one at a time.
+    # files that raise one of the skipped exceptions are left as they are.
+    size = batch_size if batch.available() else 1
+    scored = []
+    for subtitle_file in files:
+        try:
+            scored.append(load_file(subtitle_file))
+        except skipped:
+            continue
+        except Exception:
+            # the files scored before it are finished before the error stops the run.
+            finish_batch(scored, skipped)
+            raise
+        if len(scored) >= size:
+            finish_batch(scored, skipped)
+            scored = []
+    finish_batch(scored, skipped)
+
+
+def load_file(subtitle_file: Path) -> tuple:
+    # returns (subtitle_file, subtitle, reason), subtitle is None and reason set if the file couldn't be decoded.
     try:
-        subtitle = Subtitle(subtitle_file, language, destroy_list)
+        subtitle = Subtitle(subtitle_file, language, destroy_list, use_mmap, fallback_encodings)
     except UnicodeDecodeError as e:
-        print("subcleaner was unable to decode file: \"" + str(subtitle_file) + "\n\" reason: \"" + e.reason + "\"")
-        return
+        return subtitle_file, None, e.reason
 
     if not language:
         if default_language:
@@ -55,13 +105,28 @@ def clean_file(subtitle_file: Path) -> None:
         else:
             subtitle.determine_language()
 
-    cleaner.run_regex(subtitle)
-    cleaner.find_ads(subtitle)
+    cleaner.score_blocks(subtitle)
+    return subtitle_file, subtitle, None
+
+
+def finish_batch(scored: list, skipped: tuple = ()) -> None:
+    cleaner.classify([subtitle for subtitle_file, subtitle, reason in scored if subtitle is not None])
+    for subtitle_file, subtitle, reason in scored:
+        if subtitle is None:
+            print("subcleaner was unable to decode file: \"" + str(subtitle_file) + "\n\" reason: \"" + reason + "\"")
+            continue
+        try:
+            finish_file(subtitle_file, subtitle)
+        except skipped:
+            subtitle.close()
+
+
+def finish_file(subtitle_file: Path, subtitle: Subtitle) -> None:
     cleaner.remove_ads(subtitle)
     if fix_overlaps:
         cleaner.fix_overlap(subtitle)
 
-    if len(subtitle.blocks) == 0:
+    if len(subtitle) == 0:
         print("Exiting, There might be an issue with the regex, "
               "because everything in the subtitle would have gotten deleted."
               "Nothing was changed.")
@@ -75,14 +140,20 @@ def clean_file(subtitle_file: Path) -> None:
         if not no_log and log_dir is not None:
             append_file(log_dir.joinpath("subcleaner.log"), generate_log(out))
 
-    if not dry_run:
-        write_file(subtitle_file, str(subtitle))
+    if not dry_run and subtitle.changed:
+        write_subtitle(subtitle_file, subtitle)
+    subtitle.close()
 
 
 def clean_directory(directory: Path) -> None:
+    # a subtitle the parser can't make sense of raises IndexError, library runs skip it and carry on.
+    clean_files(iter_directory(directory), (IndexError,))
+
+
+def iter_directory(directory: Path) -> Iterator[Path]:
     for file in directory.iterdir():
         if file.is_dir() and not file.is_symlink():
-            clean_directory(file)
+            yield from iter_directory(file)
 
         try:
             if file.is_file():
@@ -91,10 +162,10 @@ def clean_directory(directory: Path) -> None:
                     continue
                 if language is not None:
                     if any(language == extension for extension in extensions):
-                        clean_file(file)
+                        yield file
                         continue
                 else:
-                    clean_file(file)
+                    yield file
         except IndexError:
             continue
 
@@ -132,6 +203,15 @@ def parse_args() -> None:
     parser.add_argument("--no-log", action="store_true", dest="no_log",
                         help="No log: If flag is set then nothing is logged.")
 
+    parser.add_argument("--rule-stats", action="store_true", dest="rule_stats",
+                        help="Rule stats: If flag is set then every regex is timed on its own and a table of how "
+                             "much time each regex took, how many blocks it matched and how many blocks it made "
+                             "into ads is printed when the script is done.")
+
+    parser.add_argument("--rule-stats-json", metavar="JSON", type=str, dest="rule_stats_json", default=None,
+                        help="Rule stats JSON: Time every regex like --rule-stats and write the stats to the file "
+                             "JSON when the script is done.")
+
     args = parser.parse_args()
 
     # check usage:
@@ -193,6 +273,19 @@ def parse_args() -> None:
     no_log = args.no_log
     global dry_run
     dry_run = args.dry_run
+    global rule_stats
+    rule_stats = args.rule_stats
+    global rule_stats_json
+    rule_stats_json = None
+    if args.rule_stats_json is not None:
+        rule_stats_json = Path(args.rule_stats_json)
+        if not rule_stats_json.is_absolute():
+            rule_stats_json = Path.cwd().joinpath(rule_stats_json)
+        if rule_stats_json.suffix.lower() == ".srt":
+            print("option --rule-stats-json can't write the stats to a subtitle file: \"" +
+                  str(rule_stats_json) + "\".")
+            print("see --help for more info.")
+            exit()
     global destroy_list
     destroy_list = args.destroy
     if destroy_list is not None and len(subtitles) != 1:
@@ -213,8 +306,37 @@ def parse_config() -> None:
     global regex_defaults
     regex_defaults = cfg['SETTINGS'].getboolean("use_defaults", True)
 
+    rule_budget = cfg['SETTINGS'].getfloat("rule_time_budget", 2.0)
+    if rule_budget <= 0:
+        rule_budget = None
+
+    engine_name = cfg['SETTINGS'].get("regex_engine", "re").strip().lower()
+    language_engines = None
+    if engine_name == "auto":
+        language_engines = load_choice(package_dir.joinpath(".regex_engine.json"))
+        engine = language_engines.get("", ReEngine())
+    else:
+        engine = get_engine(engine_name)
+        if engine is None:
+            print("WARN: regex engine '" + engine_name + "' is unknown or not installed. Using 're' instead.")
+            engine = ReEngine()
+
+    zones = None
+    if cfg['SETTINGS'].getboolean("zone_scan", False):
+        zones = (int(max(0.0, cfg['SETTINGS'].getfloat("head_zone", 180)) * 1000),
+                 int(max(0.0, cfg['SETTINGS'].getfloat("tail_zone", 240)) * 1000))
+
     global cleaner
-    cleaner = Cleaner(package_dir.joinpath("regex"), regex_defaults)
+    cleaner = Cleaner(package_dir.joinpath("regex"), regex_defaults,
+                      whole_file=cfg['SETTINGS'].getboolean("whole_file_regex", False),
+                      snapshot=package_dir.joinpath(".regex_snapshot.json"),
+                      rule_budget=rule_budget,
+                      cache_size=cfg['SETTINGS'].getint("score_cache_size", 10000),
+                      engine=engine,
+                      language_engines=language_engines,
+                      neighbor_window=max(0, cfg['SETTINGS'].getint("neighbor_window", 1)),
+                      cluster_window=max(0, cfg['SETTINGS'].getint("cluster_window", 15)),
+                      zones=zones)
 
     sections = cfg.sections()
 
@@ -228,7 +350,7 @@ def parse_config() -> None:
     if cfg.has_section("PURGE_REGEX") or cfg.has_section("WARNING_REGEX"):
         print("Config file is out of date. Converting the config file to follow latest config-layout will enable "
               "more granular ad-detection and warnings.")
-        cleaner.exclusive_configs.append(cfg)
+        cleaner.add_exclusive_config(config_file.name, cfg)
 
     global log_dir
     log_dir = Path(cfg["SETTINGS"].get("log_dir", "log/"))
@@ -254,15 +376,71 @@ def parse_config() -> None:
     global fix_overlaps
     fix_overlaps = cfg['SETTINGS'].getboolean("fix_overlaps", True)
 
+    global batch_size
+    batch_size = max(1, cfg['SETTINGS'].getint("batch_size", 32))
+
+    global use_mmap
+    use_mmap = cfg['SETTINGS'].getboolean("memory_map", False)
+
+    global fallback_encodings
+    fallback_encodings = []
+    for encoding in cfg['SETTINGS'].get("fallback_encodings", "").replace(" ", "").split(","):
+        if encoding == "":
+            continue
+        try:
+            lookup(encoding)
+        except LookupError:
+            print("WARN: unknown fallback encoding '" + encoding + "' in config. It will be ignored.")
+            continue
+        fallback_encodings.append(encoding)
+    if len(fallback_encodings) == 0:
+        fallback_encodings = None
+
     global default_language
     default_language = cfg['SETTINGS'].get("default_language", "")
     if any(default_language == test for test in ["blank", "Blank", ""]):
         default_language = None
 
 
-def write_file(file_path: Path, content: str) -> None:
-    with file_path.open("w", encoding="UTF-8") as file:
-        file.write(content)
+def write_subtitle(file_path: Path, subtitle: Subtitle) -> None:
+    # written next to the original and renamed over it so an interrupted run never leaves a truncated subtitle.
+    # a symlink is followed so the subtitle it points to is the one replaced.
+    file_path = file_path.resolve()
+    descriptor, temp_name = mkstemp(prefix="." + file_path.name + ".", suffix=".tmp", dir=str(file_path.parent))
+    temp_file = Path(temp_name)
+    try:
+        if subtitle.raw is not None:
+            with open(descriptor, "wb", buffering=1 << 16) as file:
+                subtitle.splice(file)
+                file.flush()
+                fsync(file.fileno())
+        else:
+            with open(descriptor, "w", encoding="UTF-8", buffering=1 << 16) as file:
+                subtitle.write(file)
+                file.flush()
+                fsync(file.fileno())
+        copymode(str(file_path), temp_name)
+        keep_owner(file_path, temp_name)
+        # a memory mapped subtitle has to let go of the file before it can be replaced on windows.
+        subtitle.close()
+        replace(temp_name, str(file_path))
+    except BaseException:
+        try:
+            temp_file.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def keep_owner(file_path: Path, temp_name: str) -> None:
+    # the new file belongs to whoever runs the script, giving it back is best effort.
+    if chown is None:
+        return
+    original = file_path.stat()
+    try:
+        chown(temp_name, original.st_uid, original.st_gid)
+    except OSError:
+        pass
 
 
 def append_file(file_path: Path, content: str) -> None:
@@ -300,7 +478,8 @@ def generate_out(subtitle_file: Path, subtitle: Subtitle) -> str:
         report += "    [WARNING]: Potential ads in " + \
                   str(len(subtitle.warning_blocks)) + " subtitle blocks, please verify:\n"
         report += "               [---------Warning Blocks----------]"
-        for block in subtitle.warning_blocks:
+        for index in subtitle.warning_blocks:
+            block = subtitle.block(index)
             report += "\n               " + str(block.index) + "\n               "
             report += str(block).replace("\n", "\n               ")[:-15]
         report += "               [---------------------------------]\n"
@@ -0,0 +1,175 @@
+from re import compile, escape, IGNORECASE, UNICODE
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# characters the re module treats as case variants of an ascii letter without lower() agreeing.
+_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s"})
+_MAX_VARIANTS = 64
+
+
+def fold(text: str) -> str:
+    return text.translate(_FOLD).lower()
+
+
+def required_literals(pattern: str) -> frozenset:
+    # returns a set of folded strings where every match of the pattern contains at least one of them,
+    # or None if no such set could be derived.
+    try:
+        parsed = sre_parse.parse(pattern, IGNORECASE | UNICODE)
+    except Exception:
+        return None
+    exact, required = _sequence(parsed)
+    if required is None and exact is not None and "" not in exact:
+        required = exact
+    if required is None:
+        return None
+    return frozenset(literal for literal in required
+                     if not any(other != literal and other in literal for other in required))
+
+
+def _sequence(items) -> tuple:
+    # returns (exact, required): every string the sequence can match, if that is a small set,
+    # and the most selective set of strings one of which is in every match.
+    run = {""}
+    exact = True
+    candidates = []
+    for op, av in items:
+        element_exact, element_required = _element(op, av)
+        if element_exact is not None and len(run) * len(element_exact) <= _MAX_VARIANTS:
+            run = {start + end for start in run for end in element_exact}
+            continue
+        exact = False
+        candidates.append(run)
+        if element_exact is not None:
+            run = set(element_exact)
+            continue
+        if element_required is not None:
+            candidates.append(element_required)
+        run = {""}
+    candidates.append(run)
+
+    required = None
+    for candidate in candidates:
+        if "" in candidate:
+            continue
+        if required is None or _quality(candidate) > _quality(required):
+            required = candidate
+    return (run if exact else None), required
+
+
+def _element(op, av) -> tuple:
+    if op is sre_parse.LITERAL:
+        character = _literal_character(av)
+        if character is not None:
+            return {character}, None
+        return None, None
+
+    if op is sre_parse.AT or op is sre_parse.ASSERT or op is sre_parse.ASSERT_NOT:
+        # zero width, the text around it is still contiguous.
+        return {""}, None
+
+    if op is sre_parse.IN:
+        characters = set()
+        for item_op, item_av in av:
+            character = _literal_character(item_av) if item_op is sre_parse.LITERAL else None
+            if character is None:
+                return None, None
+            characters.add(character)
+        return characters, None
+
+    if op is sre_parse.SUBPATTERN:
+        return _sequence(av[-1])
+
+    if op is getattr(sre_parse, "ATOMIC_GROUP", None):
+        return _sequence(av)
+
+    if op is sre_parse.BRANCH:
+        exact = set()
+        required = set()
+        for branch in av[1]:
+            branch_exact, branch_required = _sequence(branch)
+            if exact is not None and branch_exact is not None:
+                exact |= branch_exact
+            else:
+                exact = None
+            if branch_required is None and branch_exact is not None and "" not in branch_exact:
+                branch_required = branch_exact
+            if required is not None and branch_required is not None:
+                required |= branch_required
+            else:
+                required = None
+        if exact is not None and len(exact) > _MAX_VARIANTS:
+            exact = None
+        return exact, required
+
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None)):
+        minimum, maximum, item = av
+        item_exact, item_required = _sequence(item)
+        if item_exact is not None and maximum == 1:
+            return ({""} | item_exact if minimum == 0 else item_exact), None
+        if minimum >= 1:
+            if item_required is None and item_exact is not None and "" not in item_exact:
+                item_required = item_exact
+            return None, item_required
+        return None, None
+
+    return None, None
+
+
+def _literal_character(code: int) -> str:
+    character = chr(code)
+    # latin letters fold the same way in lower() and in the re module, apart from these four.
+    if code < 0x250 and code not in (0xb5, 0x130, 0x131, 0x17f):
+        return character.lower()
+    if character.lower() == character == character.upper():
+        return character
+    return None
+
+
+def _quality(literals: set) -> tuple:
+    return min(len(literal) for literal in literals), -len(literals)
+
+
+class LiteralPrefilter(object):
+    __slots__ = ("scanner", "contained", "literal_rules", "open_rules", "rule_order")
+
+    def __init__(self, rules: tuple):
+        literal_rules = dict()
+        open_rules = []
+        for rule in rules:
+            if rule.literals is None:
+                open_rules.append(rule)
+                continue
+            for literal in rule.literals:
+                literal_rules.setdefault(literal, []).append(rule)
+        self.literal_rules = literal_rules
+        self.open_rules = tuple(open_rules)
+        self.rule_order = {rule: index for index, rule in enumerate(rules)}
+
+        # the scanner reports the longest literal starting at each position,
+        # so every literal is also credited with the literals it contains.
+        literals = sorted(literal_rules, key=len, reverse=True)
+        self.contained = {literal: [other for other in literals if other in literal] for literal in literals}
+        if len(literals) > 0:
+            self.scanner = compile("(?=(" + "|".join(escape(literal) for literal in literals) + "))")
+        else:
+            self.scanner = None
+
+    def hit(self, text: str) -> bool:
+        # whether the text contains any literal at all, without working out which rules it belongs to.
+        return self.scanner is not None and self.scanner.search(fold(text)) is not None
+
+    def candidates(self, text: str) -> tuple:
+        if self.scanner is None:
+            return self.open_rules
+        found = set()
+        for match in self.scanner.finditer(fold(text)):
+            found.update(self.contained[match.group(1)])
+        if len(found) == 0:
+            return self.open_rules
+        rules = set(self.open_rules)
+        for literal in found:
+            rules.update(self.literal_rules[literal])
+        return tuple(sorted(rules, key=self.rule_order.__getitem__))
@@ -0,0 +1,285 @@
+from re import search, Pattern
+from array import array
+from bisect import bisect_right
+from time import perf_counter
+
+from .prefilter import LiteralPrefilter, required_literals
+from .keywords import KeywordMatcher, KeywordRule
+from .engines import Engine, ReEngine
+
+# compiled state for every pattern loaded in this process, shared by all rules with the same pattern and engine.
+_compiled: dict = dict()
+_default_engine = ReEngine()
+# subtitles a rule may run over the time budget on before it's disabled for the rest of the run.
+STRIKES = 3
+
+
+def compile_pattern(pattern: str, engine: Engine = None) -> tuple:
+    # returns (regex, buffer_regex, literals, engine name).
+    engine = engine or _default_engine
+    key = (engine.name, pattern)
+    if key not in _compiled:
+        try:
+            if not engine.compatible(pattern):
+                raise ValueError(pattern)
+            regex = engine.compile(pattern)
+            # lookarounds and \A, \Z would see past a block boundary in a whole file buffer.
+            if search(r"\(\?<?[=!]|\\[AZ]", pattern):
+                buffer_regex = None
+            else:
+                buffer_regex = engine.compile(pattern, multiline=True)
+            _compiled[key] = regex, buffer_regex, required_literals(pattern), engine.name
+        except Exception:
+            if engine is _default_engine:
+                raise
+            # patterns the engine can't run like re does are compiled with re instead.
+            _compiled[key] = compile_pattern(pattern)
+    return _compiled[key]
+
+
+class Rule(object):
+    __slots__ = ("pattern", "regex", "buffer_regex", "literals", "engine", "punishment", "config", "key", "elapsed",
+                 "cost", "runs", "hits")
+
+    def __init__(self, pattern: str, punishment: int, config: str, key: str, engine: Engine = None):
+        self.pattern = pattern
+        self.regex, self.buffer_regex, self.literals, self.engine = compile_pattern(pattern, engine)
+        self.punishment = punishment
+        self.config = config
+        self.key = key
+        # seconds spent on the current subtitle, checked against the time budget.
+        self.elapsed = 0.0
+        # seconds, evaluations and hits over the whole run, used to order the rules.
+        self.cost = 0.0
+        self.runs = 0
+        self.hits = 0
+
+    @property
+    def section(self) -> str:
+        return "PURGE_REGEX" if self.punishment >= 3 else "WARNING_REGEX"
+
+    def count(self, text: str, limit: int = None) -> int:
+        if limit is None:
+            return sum(1 for _ in self.regex.finditer(text))
+        count = 0
+        for _ in self.regex.finditer(text):
+            count += 1
+            if count >= limit:
+                break
+        return count
+
+    def priority(self) -> float:
+        # punishment handed out per second spent, rules without a hit keep their config order behind the others.
+        if self.hits == 0:
+            return 0.0
+        return self.punishment * self.hits / (self.cost + 1e-9)
+
+    def __repr__(self) -> str:
+        return self.config + " [" + self.key + "]: " + self.pattern
+
+
+class RuleSet(object):
+    __slots__ = ("rules", "keywords", "engine", "combined", "prefilter", "budget", "quarantined", "suspended",
+                 "strikes", "screen_elapsed", "skipped")
+
+    rules: tuple
+    keywords: KeywordMatcher
+    engine: Engine
+    combined: Pattern
+    prefilter: LiteralPrefilter
+    budget: float
+    quarantined: list
+    suspended: list
+    strikes: dict
+    skipped: int
+
+    def __init__(self, purge_regex: list, warning_regex: list, budget: float = None, purge_keywords: list = (),
+                 warning_keywords: list = (), engine: Engine = None):
+        self.engine = engine or _default_engine
+        # purge rules first, a single purge match is enough to settle a block.
+        # a pattern loaded from several configs is run once with the punishments added up.
+        rules = dict()
+        for punishment, regex in ((3, purge_regex), (1, warning_regex)):
+            for config, key, pattern in regex:
+                if pattern in rules:
+                    rules[pattern].punishment += punishment
+                    continue
+                rules[pattern] = Rule(pattern, punishment, config, key, self.engine)
+        self.rules = tuple(rules.values())
+        self.keywords = KeywordMatcher(tuple(
+            [KeywordRule(keywords, 3, config, key, "PURGE_KEYWORDS") for config, key, keywords in purge_keywords] +
+            [KeywordRule(keywords, 1, config, key, "WARNING_KEYWORDS") for config, key, keywords in warning_keywords]))
+        self.budget = budget
+        # rules disabled for the rest of the run, and rules left out for the rest of the current subtitle.
+        self.quarantined = []
+        self.suspended = []
+        self.strikes = dict()
+        # rule evaluations left out because the block was already an ad.
+        self.skipped = 0
+        self._index()
+
+    def _index(self) -> None:
+        self.combined = self._combine(self.rules, self.engine)
+        self.prefilter = LiteralPrefilter(self.rules)
+        self.screen_elapsed = 0.0
+
+    def reset_budget(self) -> None:
+        # a single huge subtitle or a busy moment doesn't cost a rule the rest of the run, only a rule that is slow
+        # on STRIKES subtitles is disabled for good.
+        if len(self.suspended) > 0:
+            self.rules += tuple(self.suspended)
+            self.suspended = []
+            self._index()
+        self.screen_elapsed = 0.0
+        for rule in self.rules:
+            rule.elapsed = 0.0
+
+    def _count(self, rule: Rule, text: str, limit: int = None) -> int:
+        start = perf_counter()
+        count = rule.count(text, limit)
+        elapsed = perf_counter() - start
+        rule.elapsed += elapsed
+        rule.cost += elapsed
+        rule.runs += 1
+        if count > 0:
+            rule.hits += 1
+        return count
+
+    def reorder(self) -> None:
+        # rules that settle blocks often and cheaply go first, so decided blocks skip more of the rest.
+        self.rules = tuple(sorted(self.rules, key=Rule.priority, reverse=True))
+        self.prefilter.rule_order = {rule: index for index, rule in enumerate(self.rules)}
+
+    def _allowance(self) -> float:
+        # the screen and the rules share one budget. the screen stops at half of it,
+        # so the rule that made it slow only has what the screen left over.
+        return self.budget - min(self.screen_elapsed, self.budget / 2)
+
+    def _enforce_budget(self) -> None:
+        # re can't interrupt a running match, so a rule is only taken out after it has spent its budget.
+        allowance = self._allowance()
+        over_budget = [rule for rule in self.rules if rule.elapsed > allowance]
+        if len(over_budget) == 0:
+            return
+        for rule in over_budget:
+            self.strikes[rule] = self.strikes.get(rule, 0) + 1
+            if self.strikes[rule] >= STRIKES:
+                self.quarantined.append(rule)
+            else:
+                self.suspended.append(rule)
+        self.rules = tuple(rule for rule in self.rules if rule.elapsed <= allowance)
+        self._index()
+
+    @staticmethod
+    def _combine(rules: tuple, engine: Engine) -> Pattern:
+        # numbered back references would point at the wrong group once the rules are joined.
+        if len(rules) < 2 or any(search(r"\\[1-9]|\(\?\(", rule.pattern) for rule in rules):
+            return None
+        # the merged pattern only runs on the engine if every rule could.
+        if any(rule.engine != engine.name for rule in rules):
+            engine = _default_engine
+        try:
+            # only a screen, so no capturing groups to fill on every attempt.
+            combined = engine.compile("|".join("(?:" + rule.pattern + ")" for rule in rules))
+        except Exception:
+            return None
+        return combined
+
+    def escalates(self, text: str) -> bool:
+        # cheap check for blocks outside the scan zones, only a keyword or a literal of some rule lets the rules run.
+        return len(self.keywords.counts(text)) > 0 or self.prefilter.hit(text)
+
+    def score(self, text: str) -> int:
+        # a score of 3 makes the block an ad whatever else matches, so counting stops there.
+        score = self.keywords.score(text)
+        if score >= 3:
+            return score
+
+        # rules whose required literals are all missing from the text can't match.
+        rules = self.prefilter.candidates(text)
+        if len(rules) == 0:
+            return score
+
+        # a single scan over the merged rules settles every block without any match.
+        # blocks with a hit are counted per rule, the merged scan can't see overlapping matches of other rules.
+        if self.combined is not None:
+            if self.budget is None:
+                if self.combined.search(text) is None:
+                    return score
+            elif self.screen_elapsed <= self.budget / 2:
+                start = perf_counter()
+                screened = self.combined.search(text) is None
+                self.screen_elapsed += perf_counter() - start
+                if screened:
+                    return score
+            # once the screen has spent its half of the budget the rules are timed one by one to find the slow one.
+
+        for position, rule in enumerate(rules):
+            score += rule.punishment * self._count(rule, text, -(-(3 - score) // rule.punishment))
+            if score >= 3:
+                self.skipped += len(rules) - position - 1
+                break
+        if self.budget is not None:
+            self._enforce_budget()
+        return score
+
+    def score_detail(self, text: str) -> list:
+        # every candidate rule is counted and timed on its own, returns (rule, count, seconds) for each of them.
+        # keyword rules are all looked up together, their time isn't split between them.
+        counts = self.keywords.counts(text)
+        details = [(rule, counts.get(rule, 0), 0.0) for rule in self.keywords.rules]
+        for rule in self.prefilter.candidates(text):
+            start = perf_counter()
+            count = rule.count(text)
+            elapsed = perf_counter() - start
+            rule.elapsed += elapsed
+            details.append((rule, count, elapsed))
+        if self.budget is not None:
+            self._enforce_budget()
+        return details
+
+    def score_all(self, texts: list) -> list:
+        # runs each rule once over all texts joined by newlines, texts must not contain newlines themselves.
+        scores = [self.keywords.score(text) for text in texts]
+        starts = array("q")
+        stops = array("q")
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text)
+            stops.append(offset)
+            offset += 1
+        buffer = "\n".join(texts)
+
+        # texts a match crossed into are recounted on their own.
+        crossed = set()
+        block_rules = []
+        for rule in self.prefilter.candidates(buffer):
+            if rule.buffer_regex is None:
+                block_rules.append(rule)
+                continue
+            # hits count blocks with a match, like _count does, not matches.
+            hit = set()
+            start = perf_counter()
+            for match in rule.buffer_regex.finditer(buffer):
+                index = bisect_right(starts, match.start()) - 1
+                if match.end() > stops[index]:
+                    crossed.update(range(index, bisect_right(starts, match.end())))
+                    continue
+                scores[index] += rule.punishment
+                hit.add(index)
+            elapsed = perf_counter() - start
+            rule.hits += len(hit)
+            rule.elapsed += elapsed
+            rule.cost += elapsed
+            rule.runs += len(texts)
+
+        for index, text in enumerate(texts):
+            if index in crossed:
+                scores[index] = self.score(text)
+                continue
+            for rule in block_rules:
+                scores[index] += rule.punishment * self._count(rule, text)
+        if self.budget is not None:
+            self._enforce_budget()
+        return scores
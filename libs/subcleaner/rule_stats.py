@@ -0,0 +1,60 @@
+from pathlib import Path
+import json
+
+
+class RuleStat(object):
+    __slots__ = ("config", "key", "section", "pattern", "blocks", "matches", "tipped", "elapsed")
+
+    def __init__(self, config: str, key: str, section: str, pattern: str):
+        self.config = config
+        self.key = key
+        self.section = section
+        self.pattern = pattern
+        # blocks the rule was run on, blocks the prefilter ruled out don't count.
+        self.blocks = 0
+        self.matches = 0
+        # blocks that only reached the ad threshold because of this rule.
+        self.tipped = 0
+        self.elapsed = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "config": self.config,
+            "key": self.key,
+            "section": self.section,
+            "pattern": self.pattern,
+            "blocks": self.blocks,
+            "matches": self.matches,
+            "tipped": self.tipped,
+            "seconds": self.elapsed,
+        }
+
+
+class RuleStats(object):
+    stats: dict
+
+    def __init__(self):
+        self.stats = dict()
+
+    def stat(self, rule) -> RuleStat:
+        # the same rule is loaded once for every language it applies to.
+        identity = (rule.config, rule.section, rule.key, rule.pattern)
+        if identity not in self.stats:
+            self.stats[identity] = RuleStat(rule.config, rule.key, rule.section, rule.pattern)
+        return self.stats[identity]
+
+    def ranked(self) -> list:
+        return sorted(self.stats.values(), key=lambda stat: (-stat.elapsed, -stat.matches, stat.config, stat.key))
+
+    def table(self) -> str:
+        lines = ["[-----------------------------------Regex Stats-----------------------------------]",
+                 "{:>10} {:>8} {:>8} {:>7}  {}".format("time (ms)", "blocks", "matches", "tipped", "regex")]
+        for stat in self.ranked():
+            lines.append("{:>10.1f} {:>8} {:>8} {:>7}  {} [{}] {}".format(
+                stat.elapsed * 1000, stat.blocks, stat.matches, stat.tipped, stat.config, stat.section, stat.key))
+        lines.append("[---------------------------------------------------------------------------------]")
+        return "\n".join(lines)
+
+    def dump(self, file_path: Path) -> None:
+        file_path.write_text(json.dumps([stat.as_dict() for stat in self.ranked()], indent=2, ensure_ascii=False),
+                             encoding="UTF-8")
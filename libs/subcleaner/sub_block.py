@@ -1,69 +1,57 @@
 from datetime import timedelta
-from math import floor
+from .timestamp import parse_timestamp, format_timing
 
 
 class SubBlock(object):
+    __slots__ = ("index", "content", "start_ms", "stop_ms", "regex_matches")
+
     index: int
     content: str
-    start_time: timedelta
-    stop_time: timedelta
+    start_ms: int
+    stop_ms: int
     regex_matches: int
 
     def __init__(self, orig_index):
         self.index = orig_index
         self.regex_matches = 0
         self.content = ""
-        self.start_time = None
-        self.stop_time = None
-
-    def set_start_time(self, time: str) -> None:
-        self.start_time = self._convert_to_timedelta(time)
-
-    def set_stop_time(self, time) -> None:
-        self.stop_time = self._convert_to_timedelta(time)
-
-    @staticmethod
-    def _convert_to_timedelta(time) -> timedelta:
-        time = time.replace(",", ".").replace(" ", "")
-        split = time.split(":")
+        self.start_ms = None
+        self.stop_ms = None
 
-        return timedelta(hours=float(split[0]),
-                         minutes=float(split[1]),
-                         seconds=float(split[2]))
+    @property
+    def start_time(self) -> timedelta:
+        if self.start_ms is None:
+            return None
+        return timedelta(milliseconds=self.start_ms)
 
-    @staticmethod
-    def _convert_from_timedelta(time: timedelta) -> str:
-        time_left = time.total_seconds()
-
-        hours = floor(time_left / (60 * 60))
-        time_left = time_left - hours * (60 * 60)
+    @start_time.setter
+    def start_time(self, time: timedelta) -> None:
+        self.start_ms = self._convert_timedelta_to_milliseconds(time)
 
-        minutes = floor(time_left / 60)
-        time_left = time_left - minutes * 60
+    @property
+    def stop_time(self) -> timedelta:
+        if self.stop_ms is None:
+            return None
+        return timedelta(milliseconds=self.stop_ms)
 
-        seconds = floor(time_left)
-        time_left = time_left - seconds
+    @stop_time.setter
+    def stop_time(self, time: timedelta) -> None:
+        self.stop_ms = self._convert_timedelta_to_milliseconds(time)
 
-        mill = floor(time_left * 1000)
-
-        hours_str = str(hours)
-        minutes_str = str(minutes)
-        seconds_str = str(seconds)
-        mill_str = str(mill)
+    def set_start_time(self, time: str) -> None:
+        self.start_ms = parse_timestamp(time)
 
-        hours_str = "0" * (2 - len(hours_str)) + hours_str
-        minutes_str = "0" * (2 - len(minutes_str)) + minutes_str
-        seconds_str = "0" * (2 - len(seconds_str)) + seconds_str
-        mill_str = "0" * (3 - len(mill_str)) + mill_str
+    def set_stop_time(self, time) -> None:
+        self.stop_ms = parse_timestamp(time)
 
-        return hours_str + ":" + minutes_str + ":" + seconds_str + "," + mill_str
+    @staticmethod
+    def _convert_timedelta_to_milliseconds(time: timedelta) -> int:
+        if time is None:
+            return None
+        return time // timedelta(milliseconds=1)
 
     def __repr__(self) -> str:
 
-        string = (self._convert_from_timedelta(self.start_time) +
-                  " --> " +
-                  self._convert_from_timedelta(self.stop_time) +
-                  "\n")
+        string = format_timing(self.start_ms, self.stop_ms) + "\n"
         string += self.content
         return string
-
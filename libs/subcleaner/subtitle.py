@@ -1,89 +1,319 @@
 from .sub_block import SubBlock
+from .timestamp import format_timing, parse_timestamp
 from libs import langdetect
 from pathlib import Path
+from typing import Iterable, Iterator, List
+from array import array
+from codecs import BOM_UTF8, BOM_UTF16_BE, BOM_UTF16_LE, BOM_UTF32_BE, BOM_UTF32_LE, getincrementaldecoder, lookup
+from io import BytesIO, TextIOWrapper
+from itertools import compress
+from locale import getpreferredencoding
+import mmap
+
+# utf-32 has to be checked before utf-16 since their little endian BOMs share a prefix.
+_BOMS = ((BOM_UTF32_LE, "utf-32"), (BOM_UTF32_BE, "utf-32"), (BOM_UTF8, "utf-8-sig"),
+         (BOM_UTF16_LE, "utf-16"), (BOM_UTF16_BE, "utf-16"))
+
+
+def iter_blocks(stream: Iterable[str]) -> Iterator[SubBlock]:
+    current_index = 1
+    block = SubBlock(current_index)
+    content: list = []
+    for line in stream:
+        if line[-1:] == "\n":
+            line = line[:-1]
+
+        if len(line) == 0:
+            if block.stop_ms is not None:
+                block.content = "".join(content)
+                yield block
+                current_index += 1
+                block = SubBlock(current_index)
+                content = []
+            continue
+
+        if " --> " in line and block.stop_ms is None:
+            start_string, stop_string = line.split(" --> ")[:2]
+            block.set_start_time(start_string.rstrip()[:12])
+            block.set_stop_time(stop_string.rstrip()[:12])
+            continue
+
+        if block.stop_ms is not None:
+            content.append(line + "\n")
+    if block.stop_ms is not None:
+        block.content = "".join(content)
+        yield block
+
+
+def scan_blocks(buffer, position: int = 0) -> Iterator[tuple]:
+    # yields (start_ms, stop_ms, timing_start, timing_stop, content_start, content_stop)
+    # with byte offsets into buffer.
+    start_ms = None
+    stop_ms = None
+    timing_start = 0
+    timing_stop = 0
+    content_start = 0
+    end = len(buffer)
+    while position < end:
+        line_end = buffer.find(b"\n", position)
+        if line_end == -1:
+            line_end = end
+        next_position = line_end + 1
+        line_length = line_end - position
+        if line_length > 0 and buffer[line_end - 1:line_end] == b"\r":
+            line_length -= 1
+
+        if line_length == 0:
+            if stop_ms is not None:
+                yield start_ms, stop_ms, timing_start, timing_stop, content_start, position
+                start_ms = None
+                stop_ms = None
+        elif stop_ms is None and buffer.find(b" --> ", position, line_end) != -1:
+            line = buffer[position:line_end].decode("latin-1")
+            start_string, stop_string = line.split(" --> ")[:2]
+            start_ms = parse_timestamp(start_string.rstrip()[:12])
+            stop_ms = parse_timestamp(stop_string.rstrip()[:12])
+            timing_start = position
+            timing_stop = position + line_length
+            content_start = min(next_position, end)
+        position = next_position
+    if stop_ms is not None:
+        yield start_ms, stop_ms, timing_start, timing_stop, content_start, end
+
+
+def sniff_bom(buffer) -> tuple:
+    for bom, encoding in _BOMS:
+        if buffer[:len(bom)] == bom:
+            return encoding, len(bom)
+    return None, 0
+
+
+def _ascii_compatible(encoding: str) -> bool:
+    sample = "\r\n --> 0123456789:,."
+    return lookup(encoding).name == "utf-8-sig" or sample.encode(encoding) == sample.encode("ascii")
+
+
+def _detect_encoding(buffer, position: int, encodings: list) -> str:
+    for encoding in encodings:
+        decoder = getincrementaldecoder(encoding)()
+        try:
+            for chunk_start in range(position, len(buffer), 1 << 16):
+                decoder.decode(buffer[chunk_start:chunk_start + (1 << 16)])
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            if encoding == encodings[-1]:
+                raise
 
 
 class Subtitle(object):
-    blocks: list
-    ad_blocks: list
-    warning_blocks: list
+    start_times: array
+    stop_times: array
+    regex_matches: array
+    text: str
+    raw: mmap.mmap
+    encoding: str
+    changed: bool
+    text_starts: array
+    text_stops: array
+    timing_starts: array
+    timing_stops: array
+    retimed: bytearray
+    # copies of the blocks found to be ads, numbered as they were in the file.
+    ad_blocks: List[SubBlock]
+    # positions of the blocks to warn about. after remove_ads they count the blocks that are left,
+    # block(index) gives the block as it will be written.
+    warning_blocks: List[int]
     language: str
     file: Path
 
-    def __init__(self, subtitle_file: Path, language: str, destroy_list: list):
-        self.blocks: list = list()
+    def __init__(self, subtitle_file: Path, language: str, destroy_list: list, use_mmap: bool = False,
+                 fallback_encodings: list = None):
         self.ad_blocks = []
         self.warning_blocks = []
         self.language = language
         self.file = subtitle_file
+        self.raw = None
+        self.encoding = None
+        self.changed = False
 
-        try:
-            with subtitle_file.open("r", encoding="utf-8") as file:
-                self._parse_file(file.read())
-        except UnicodeDecodeError:
-            with subtitle_file.open("r") as file:
-                self._parse_file(file.read())
+        if fallback_encodings is None:
+            fallback_encodings = [getpreferredencoding(False)]
+        self._load_file(use_mmap, fallback_encodings)
 
         if destroy_list is not None:
             for index in destroy_list:
-                self.blocks[index-1].regex_matches = 3
+                self.regex_matches[index-1] = 3
 
-    def add_block(self, block: SubBlock) -> None:
-        self.blocks.append(block)
+    def __len__(self) -> int:
+        return len(self.start_times)
 
-    def remove_block(self, block: SubBlock) -> None:
-        if block is not None:
-            try:
-                self.blocks.remove(block)
-            except ValueError:
-                pass
+    def content(self, index: int) -> str:
+        if self.raw is None:
+            return self.text[self.text_starts[index]:self.text_stops[index]]
+        content = self.raw[self.text_starts[index]:self.text_stops[index]].decode(self.encoding)
+        content = content.replace("\r\n", "\n")
+        if len(content) > 0 and content[-1] != "\n":
+            content += "\n"
+        return content
+
+    def close(self) -> None:
+        if self.raw is not None:
+            self.raw.close()
+            self.raw = None
+
+    def block(self, index: int) -> SubBlock:
+        block = SubBlock(index + 1)
+        block.content = self.content(index)
+        block.start_ms = self.start_times[index]
+        block.stop_ms = self.stop_times[index]
+        block.regex_matches = self.regex_matches[index]
+        return block
+
+    def remove_blocks(self, indices: set) -> None:
+        if len(indices) == 0:
+            return
+        keep = bytearray(b"\x01") * len(self)
+        for index in indices:
+            keep[index] = 0
+        self.start_times = array("q", compress(self.start_times, keep))
+        self.stop_times = array("q", compress(self.stop_times, keep))
+        self.regex_matches = array("i", compress(self.regex_matches, keep))
+        self.text_starts = array("q", compress(self.text_starts, keep))
+        self.text_stops = array("q", compress(self.text_stops, keep))
+        self.timing_starts = array("q", compress(self.timing_starts, keep))
+        self.timing_stops = array("q", compress(self.timing_stops, keep))
+        self.retimed = bytearray(compress(self.retimed, keep))
 
     def check_language(self) -> bool:
-        sub_content: str = ""
-        for block in self.blocks:
-            sub_content += block.content
+        sub_content: str = "".join(self.content(index) for index in range(len(self)))
         detected_language = langdetect.detect_langs(sub_content)[0]
         return detected_language.lang == self.language and detected_language.prob > 0.8
 
-    def _parse_file(self, file_content: str) -> None:
-        current_index = 1
-        block = SubBlock(current_index)
-        for line in file_content.split("\n"):
-            if len(line) == 0:
-                if block.stop_time is not None:
-                    self.blocks.append(block)
-                    current_index += 1
-                    block = SubBlock(current_index)
-                continue
-
-            if " --> " in line and block.stop_time is None:
-                start_string = line.split(" --> ")[0].rstrip()[:12]
-                block.set_start_time(start_string)
-
-                stop_string = line.split(" --> ")[1].rstrip()[:12]
-                block.set_stop_time(stop_string)
-                continue
-
-            if block.stop_time is not None:
-                block.content = block.content + line + "\n"''
-        if block.stop_time is not None:
-            self.blocks.append(block)
+    def _parse_file(self, stream: Iterable[str]) -> None:
+        self._reset_columns()
+
+        contents: list = []
+        offset = 0
+        for block in iter_blocks(stream):
+            self.start_times.append(block.start_ms)
+            self.stop_times.append(block.stop_ms)
+            self.regex_matches.append(block.regex_matches)
+            self.text_starts.append(offset)
+            offset += len(block.content)
+            self.text_stops.append(offset)
+            contents.append(block.content)
+        self.text = "".join(contents)
+        self.retimed = bytearray(len(self))
+
+    def _load_file(self, use_mmap: bool, fallback_encodings: list) -> None:
+        with self.file.open("rb") as file:
+            if use_mmap and self.file.stat().st_size > 0:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # empty files can't be mapped.
+                buffer = file.read()
+
+        bom_encoding, position = sniff_bom(buffer)
+        if bom_encoding is not None:
+            encodings = [bom_encoding]
+        else:
+            encodings = ["utf-8"] + [encoding for encoding in fallback_encodings if encoding != "utf-8"]
+
+        if isinstance(buffer, mmap.mmap) and bom_encoding in (None, "utf-8-sig"):
+            try:
+                self.encoding = _detect_encoding(buffer, position, encodings)
+            except UnicodeDecodeError:
+                buffer.close()
+                raise
+            if _ascii_compatible(self.encoding):
+                self.raw = buffer
+                self._scan_file(position)
+                return
+            encodings = [self.encoding]
+
+        try:
+            for encoding in encodings:
+                try:
+                    self._parse_file(TextIOWrapper(BytesIO(buffer), encoding=encoding))
+                    self.encoding = encoding
+                    return
+                except UnicodeDecodeError:
+                    if encoding == encodings[-1]:
+                        raise
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def _scan_file(self, position: int) -> None:
+        self._reset_columns()
+        self.text = None
+
+        for start_ms, stop_ms, timing_start, timing_stop, content_start, content_stop in scan_blocks(self.raw,
+                                                                                                      position):
+            self.start_times.append(start_ms)
+            self.stop_times.append(stop_ms)
+            self.regex_matches.append(0)
+            self.timing_starts.append(timing_start)
+            self.timing_stops.append(timing_stop)
+            self.text_starts.append(content_start)
+            self.text_stops.append(content_stop)
+        self.retimed = bytearray(len(self))
+
+    def _reset_columns(self) -> None:
+        self.start_times = array("q")
+        self.stop_times = array("q")
+        self.regex_matches = array("i")
+        self.text_starts = array("q")
+        self.text_stops = array("q")
+        self.timing_starts = array("q")
+        self.timing_stops = array("q")
+        self.retimed = bytearray()
+
+    def iter_srt(self) -> Iterator[str]:
+        for index in range(len(self)):
+            if index > 0:
+                yield "\n"
+            yield str(index + 1) + "\n" + format_timing(self.start_times[index], self.stop_times[index]) + "\n"
+            yield self.content(index)
+
+    def write(self, file) -> None:
+        file.writelines(self.iter_srt())
+
+    def iter_splice(self) -> Iterator[bytes]:
+        # copies the original bytes of every block, only index lines and moved timings are regenerated.
+        raw = self.raw
+        if len(self) == 0:
+            return
+        first_timing_stop = self.timing_stops[0]
+        eol = b"\r\n" if raw[first_timing_stop:first_timing_stop + 2] == b"\r\n" else b"\n"
+        if self.encoding == "utf-8-sig":
+            yield BOM_UTF8
+        for index in range(len(self)):
+            if index > 0:
+                yield eol
+            yield str(index + 1).encode("ascii") + eol
+            if self.retimed[index]:
+                yield format_timing(self.start_times[index], self.stop_times[index]).encode("ascii")
+            else:
+                yield raw[self.timing_starts[index]:self.timing_stops[index]]
+            yield eol
+            content = raw[self.text_starts[index]:self.text_stops[index]]
+            yield content
+            if len(content) > 0 and content[-1:] != b"\n":
+                yield eol
+
+    def splice(self, file) -> None:
+        file.writelines(self.iter_splice())
 
     def __repr__(self):
-        sub_file_content = ""
-        for i in range(len(self.blocks)):
-            sub_file_content += (str(i+1) + "\n")
-            sub_file_content += (str(self.blocks[i]))
-            sub_file_content += "\n"
-        return sub_file_content[:-1]
+        return "".join(self.iter_srt())
 
     def determine_language(self):
         if len(self.file.name.split(".")) > 2:
             self.language = self.file.name.split(".")[1]
         else:
-            sub_content: str = ""
-            for block in self.blocks:
-                sub_content += block.content
+            sub_content: str = "".join(self.content(index) for index in range(len(self)))
             detected_language = langdetect.detect_langs(sub_content)[0]
             if detected_language.prob > 0.8:
                 self.language = detected_language.lang
@@ -0,0 +1,35 @@
+_TWO_DIGITS = tuple("%02d" % number for number in range(100))
+_THREE_DIGITS = tuple("%03d" % number for number in range(1000))
+
+
+def parse_timestamp(time: str) -> int:
+    if len(time) == 12 and time[2] == ":" and time[5] == ":" and time[8] in ",.":
+        try:
+            # HH MM SS mmm packed into one 9 digit integer.
+            packed = int(time[0:2] + time[3:5] + time[6:8] + time[9:12])
+        except ValueError:
+            return parse_timestamp_tolerant(time)
+        return packed // 10000000 * 3600000 + packed // 100000 % 100 * 60000 + packed % 100000
+    return parse_timestamp_tolerant(time)
+
+
+def parse_timestamp_tolerant(time: str) -> int:
+    time = time.replace(",", ".").replace(" ", "")
+    split = time.split(":")
+
+    return round(float(split[0]) * 3600000 + float(split[1]) * 60000 + float(split[2]) * 1000)
+
+
+def format_timestamp(time: int) -> str:
+    seconds, mill = divmod(time, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours < 100:
+        hours_str = _TWO_DIGITS[hours]
+    else:
+        hours_str = str(hours)
+    return hours_str + ":" + _TWO_DIGITS[minutes] + ":" + _TWO_DIGITS[seconds] + "," + _THREE_DIGITS[mill]
+
+
+def format_timing(start: int, stop: int) -> str:
+    return format_timestamp(start) + " --> " + format_timestamp(stop)
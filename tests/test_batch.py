@@ -0,0 +1,74 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from random import Random
+from array import array
+import unittest
+
+from libs.subcleaner.subtitle import Subtitle, format_timing
+from libs.subcleaner.cleaner import Cleaner
+from libs.subcleaner.batch import Batch
+from libs.subcleaner import batch
+
+
+def write_srt(file_path: Path, random: Random, block_count: int) -> None:
+    lines = []
+    time = random.randint(0, 3000)
+    for index in range(block_count):
+        start = time
+        stop = start + random.randint(500, 3000)
+        # gaps on both sides of the one second that decides between ad and warning.
+        time = stop + random.choice((0, 200, 999, 1000, 1001, 2500))
+        lines.append(str(index + 1) + "\n" + format_timing(start, stop) + "\nblock " + str(index) + "\n")
+    file_path.write_text("\n".join(lines), encoding="UTF-8")
+
+
+def loop_result(subtitle: Subtitle, neighbor_window: int, cluster_window: int) -> tuple:
+    # what Cleaner.classify does for one subtitle without numpy.
+    if len(subtitle) >= 10:
+        Cleaner._neighbor_pass(subtitle.regex_matches, neighbor_window, 2, False, 3)
+    if len(subtitle) >= 100:
+        Cleaner._neighbor_pass(subtitle.regex_matches, cluster_window, 3, True)
+    Cleaner.find_ads(subtitle)
+    return (subtitle.regex_matches.tolist(), [block.index - 1 for block in subtitle.ad_blocks],
+            subtitle.warning_blocks)
+
+
+@unittest.skipUnless(batch.available(), "numpy is not installed")
+class BatchTest(unittest.TestCase):
+    def test_matches_per_file_loops(self):
+        random = Random(24)
+        with TemporaryDirectory() as directory:
+            for run in range(60):
+                sizes = [random.choice((1, 2, 3, 9, 10, 11, 40, 99, 100, 101, 180))
+                         for _ in range(random.randint(1, 6))]
+                files = []
+                for number, size in enumerate(sizes):
+                    files.append(Path(directory).joinpath(str(run) + "_" + str(number) + ".en.srt"))
+                    write_srt(files[-1], random, size)
+                scores = [array("i", (random.choice((-1, -1, -1, 0, 1, 2, 3)) for _ in range(size)))
+                          for size in sizes]
+                neighbor_window = random.choice((0, 1, 2, 5))
+                cluster_window = random.choice((0, 1, 15, 50))
+
+                expected = []
+                subtitles = []
+                for file, score in zip(files, scores):
+                    subtitle = Subtitle(file, "en", None)
+                    subtitle.regex_matches = array("i", score)
+                    expected.append(loop_result(subtitle, neighbor_window, cluster_window))
+                    subtitle = Subtitle(file, "en", None)
+                    subtitle.regex_matches = array("i", score)
+                    subtitles.append(subtitle)
+
+                columns = Batch(subtitles)
+                columns.neighbor_pass(neighbor_window, 2, False, 3, 10)
+                columns.neighbor_pass(cluster_window, 3, True, 0, 100)
+                ads, warnings = columns.find_ads()
+                for number in range(len(subtitles)):
+                    matches, ad_indices, warning_indices = columns.results(number, ads, warnings)
+                    self.assertEqual(expected[number], (matches, ad_indices, warning_indices),
+                                     "sizes " + str(sizes) + ", windows " + str((neighbor_window, cluster_window)))
+
+
+if __name__ == "__main__":
+    unittest.main()
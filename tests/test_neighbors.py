@@ -0,0 +1,73 @@
+from random import Random
+from array import array
+import unittest
+
+from libs.subcleaner.cleaner import Cleaner
+
+
+def slice_pass(matches: list, window: int, threshold: int, include_self: bool, edges: int) -> None:
+    # the neighbor loops as they were written against subtitle.blocks, with the window made a parameter.
+    for index in range(0, len(matches)):
+        if index < edges or index > len(matches) - edges - 1:
+            matches[index] += 1
+            continue
+        for neighbor in range(max(0, index - window), min(index + window + 1, len(matches))):
+            if matches[neighbor] >= threshold and (include_self or index != neighbor):
+                matches[index] += 1
+                break
+
+
+def slice_propagate(matches: list, neighbor_window: int, cluster_window: int) -> None:
+    if len(matches) >= 10:
+        slice_pass(matches, neighbor_window, 2, False, 3)
+    if len(matches) >= 100:
+        slice_pass(matches, cluster_window, 3, True, 0)
+
+
+class NeighborPassTest(unittest.TestCase):
+    def test_matches_slice_loops(self):
+        random = Random(23)
+        for size in (1, 2, 6, 7, 9, 10, 11, 12, 40, 99, 100, 101, 150):
+            for neighbor_window in (0, 1, 15):
+                for cluster_window in (0, 1, 15):
+                    for _ in range(25):
+                        # mostly clean blocks with a few warnings and ads, sometimes in runs.
+                        weights = random.choice(((80, 10, 5, 5, 0), (40, 20, 20, 10, 10), (10, 10, 30, 30, 20)))
+                        scores = random.choices((-1, 0, 1, 2, 3), weights, k=size)
+                        expected = list(scores)
+                        slice_propagate(expected, neighbor_window, cluster_window)
+
+                        matches = array("i", scores)
+                        if size >= 10:
+                            Cleaner._neighbor_pass(matches, neighbor_window, 2, False, 3)
+                        if size >= 100:
+                            Cleaner._neighbor_pass(matches, cluster_window, 3, True)
+                        windows = (neighbor_window, cluster_window)
+                        self.assertEqual(expected, matches.tolist(),
+                                         "scores " + str(scores) + ", windows " + str(windows))
+
+    def test_first_pass_skips_the_block_itself(self):
+        # a lone block with 2 warnings doesn't raise itself, only its neighbors.
+        matches = array("i", [-1] * 12)
+        matches[6] = 2
+        Cleaner._neighbor_pass(matches, 1, 2, False, 3)
+        self.assertEqual([0, 0, 0, -1, -1, 0, 2, 0, -1, 0, 0, 0], matches.tolist())
+
+        expected = [-1] * 12
+        expected[6] = 2
+        slice_pass(expected, 1, 2, False, 3)
+        self.assertEqual(expected, matches.tolist())
+
+    def test_raised_blocks_raise_the_next_block(self):
+        # blocks are raised in place, a block raised to the threshold counts for the blocks after it.
+        scores = [-1, -1, -1, -1, 2, 1, 1, 1, -1, -1, -1, -1]
+        expected = list(scores)
+        slice_pass(expected, 1, 2, False, 3)
+        matches = array("i", scores)
+        Cleaner._neighbor_pass(matches, 1, 2, False, 3)
+        self.assertEqual(expected, matches.tolist())
+        self.assertEqual([2, 2, 2], matches.tolist()[5:8])
+
+
+if __name__ == "__main__":
+    unittest.main()
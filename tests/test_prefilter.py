@@ -0,0 +1,145 @@
+from configparser import ConfigParser
+from pathlib import Path
+from random import Random
+from re import IGNORECASE, UNICODE
+import unittest
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from libs.subcleaner.rule_set import Rule
+from libs.subcleaner.prefilter import LiteralPrefilter
+
+REGEX_DIR = Path(__file__).parent.parent.joinpath("regex", "default")
+# characters the re module folds differently from str.lower(), and characters that have no case.
+FOLD_EDGES = "ſsSıiIİkKKµμΜǅǄǆßẞ"
+TEXTS = (
+    "Subtitles by ExplosiveSkull - www.OpenSubtitles.org",
+    "Undertexter: Svensk Medietext, åäö ÅÄÖ éè",
+    "Synced & corrected by someone, 1080p.WEB-DL",
+    "ſ İ ı µ K Å straße ǅ",
+    "Advertise your product or brand here, contact www.OpenSubtitles.org today",
+    "- I can't go home.\n- Why not?",
+)
+PATTERNS = (
+    r"foo(bar)?baz",
+    r"(ab|cd)+x",
+    r"a(?=b)c",
+    r"a(?=b)\w",
+    r"(?<=x)yz|w(?!q)v",
+    r"K",
+    r"k",
+    r"i",
+    r"İ",
+    r"ı",
+    r"s",
+    r"ſ",
+    r"µ",
+    r"ǅ",
+    r"straße",
+    r"\bsub(s|titles?)\b",
+    r"(www\.)?site\.(com|org)",
+    r"x(a|)y",
+    r"(?:colou?r)+s",
+    r"[kK]elvin|ohm",
+)
+
+
+def default_patterns() -> list:
+    patterns = []
+    for config in sorted(REGEX_DIR.glob("*.conf")):
+        parser = ConfigParser()
+        parser.read(config, encoding="utf-8")
+        for section in ("PURGE_REGEX", "WARNING_REGEX"):
+            if parser.has_section(section):
+                patterns += [value for key, value in parser.items(section)]
+    return patterns
+
+
+def sample(items, random: Random) -> str:
+    # a random text the parsed pattern is likely to match, lookarounds are left out.
+    text = ""
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            text += chr(av)
+        elif op is sre_parse.NOT_LITERAL:
+            text += random.choice([character for character in "a 1." if ord(character) != av])
+        elif op is sre_parse.ANY:
+            text += random.choice("a .")
+        elif op is sre_parse.IN:
+            text += sample_set(av, random)
+        elif op is sre_parse.BRANCH:
+            text += sample(random.choice(av[1]), random)
+        elif op is sre_parse.SUBPATTERN:
+            text += sample(av[-1], random)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            minimum, maximum, item = av
+            for _ in range(random.randint(minimum, min(maximum, minimum + 3))):
+                text += sample(item, random)
+    return text
+
+
+def sample_set(items, random: Random) -> str:
+    characters = []
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            return random.choice("a1 .")
+        if op is sre_parse.LITERAL:
+            characters.append(chr(av))
+        elif op is sre_parse.RANGE:
+            characters.append(chr(random.randint(av[0], av[1])))
+        elif op is sre_parse.CATEGORY:
+            characters.append({"CATEGORY_DIGIT": "7", "CATEGORY_SPACE": " ", "CATEGORY_WORD": "w"}.get(str(av), "."))
+    return random.choice(characters) if len(characters) > 0 else "."
+
+
+def variants(text: str, random: Random) -> list:
+    # case changes and the characters re folds to ascii letters.
+    edged = ""
+    for character in text:
+        options = [other for other in FOLD_EDGES if other.lower() == character.lower() or
+                   other.casefold() == character.casefold()]
+        edged += random.choice(options + [character])
+    return [text, text.upper(), text.lower(), text.swapcase(), text.title(), edged]
+
+
+class PrefilterTest(unittest.TestCase):
+    def assert_sound(self, patterns: list, texts: list) -> None:
+        rules = tuple(Rule(pattern, 1, "test.conf", "regex" + str(index)) for index, pattern in enumerate(patterns))
+        prefilter = LiteralPrefilter(rules)
+        for text in texts:
+            candidates = prefilter.candidates(text)
+            for rule in rules:
+                if rule.regex.search(text) is not None:
+                    self.assertIn(rule, candidates, "prefilter left out " + repr(rule) + " for " + repr(text))
+
+    def texts(self, patterns: list, random: Random) -> list:
+        texts = []
+        for text in TEXTS:
+            texts += variants(text, random)
+        for pattern in patterns:
+            parsed = sre_parse.parse(pattern, IGNORECASE | UNICODE)
+            for _ in range(20):
+                text = random.choice(("", "x ", "Visit ")) + sample(parsed, random) + random.choice(("", " y", "."))
+                texts += variants(text, random)
+        for character in FOLD_EDGES:
+            texts += [character, "a" + character + "b", character * 3]
+        return texts
+
+    def test_default_regex(self):
+        patterns = default_patterns()
+        self.assertGreater(len(patterns), 0)
+        self.assert_sound(patterns, self.texts(patterns, Random(14)))
+
+    def test_edge_patterns(self):
+        patterns = list(PATTERNS)
+        self.assert_sound(patterns, self.texts(patterns, Random(14)))
+
+    def test_unrelated_text_is_ruled_out(self):
+        rules = (Rule("opensub", 3, "test.conf", "regex1"), Rule(r"www\.", 1, "test.conf", "regex2"))
+        self.assertEqual((), LiteralPrefilter(rules).candidates("- I can't go home."))
+
+
+if __name__ == "__main__":
+    unittest.main()
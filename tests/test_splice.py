@@ -0,0 +1,110 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from io import BytesIO, StringIO
+from codecs import BOM_UTF8
+import unittest
+
+from libs.subcleaner.subtitle import Subtitle
+from libs.subcleaner.cleaner import Cleaner
+
+BLOCKS = (
+    ("00:00:01,326 --> 00:00:02,743", "Subtitles by someone\n"),
+    ("00:00:03,128 --> 00:00:05,165", "sat what\nsecond line é\n"),
+    # overlaps the next block, so fix_overlap has to rewrite both timings.
+    ("00:00:05,150 --> 00:00:07,688", "let let fine cat fine\n"),
+    ("00:00:07,600 --> 00:00:08,881", "- what a okay\n- on fine went\n"),
+    ("00:00:09,621 --> 00:00:12,760", "café crème, naïve\n"),
+)
+
+
+def srt(eol: str, final_newline: bool = True) -> str:
+    text = eol.join(str(index + 1) + eol + timing + eol + content.replace("\n", eol)
+                    for index, (timing, content) in enumerate(BLOCKS))
+    if not final_newline:
+        text = text[:-len(eol)]
+    return text
+
+
+class SpliceTest(unittest.TestCase):
+    directory: TemporaryDirectory
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, data: bytes, use_mmap: bool) -> Subtitle:
+        file = Path(self.directory.name).joinpath("test.en.srt")
+        file.write_bytes(data)
+        return Subtitle(file, "en", None, use_mmap, ["cp1252"])
+
+    def clean(self, data: bytes) -> tuple:
+        # (text mode output, spliced bytes) after removing the first block and fixing overlaps.
+        outputs = []
+        for use_mmap in (False, True):
+            subtitle = self.load(data, use_mmap)
+            self.assertEqual(use_mmap, subtitle.raw is not None)
+            subtitle.remove_blocks({0})
+            Cleaner.fix_overlap(subtitle)
+            if use_mmap:
+                output = BytesIO()
+                subtitle.splice(output)
+            else:
+                output = StringIO()
+                subtitle.write(output)
+            outputs.append(output.getvalue())
+            subtitle.close()
+        return outputs[0], outputs[1]
+
+    def assert_same_text(self, text: str, spliced: bytes, encoding: str) -> None:
+        self.assertEqual(text, spliced.decode(encoding).replace("\r\n", "\n"))
+
+    def test_unchanged_blocks_keep_their_bytes(self):
+        for eol in ("\n", "\r\n"):
+            data = srt(eol).encode("utf-8")
+            subtitle = self.load(data, True)
+            output = BytesIO()
+            subtitle.splice(output)
+            subtitle.close()
+            self.assertEqual(data, output.getvalue())
+
+    def test_lf(self):
+        text, spliced = self.clean(srt("\n").encode("utf-8"))
+        self.assert_same_text(text, spliced, "utf-8")
+        self.assertNotIn(b"\r", spliced)
+
+    def test_crlf(self):
+        text, spliced = self.clean(srt("\r\n").encode("utf-8"))
+        self.assert_same_text(text, spliced, "utf-8")
+        self.assertEqual(spliced.count(b"\n"), spliced.count(b"\r\n"))
+
+    def test_bom(self):
+        text, spliced = self.clean(BOM_UTF8 + srt("\r\n").encode("utf-8"))
+        self.assertTrue(spliced.startswith(BOM_UTF8))
+        self.assertFalse(spliced[len(BOM_UTF8):].startswith(BOM_UTF8))
+        self.assert_same_text(text, spliced, "utf-8-sig")
+
+    def test_cp1252_stays_cp1252(self):
+        data = srt("\r\n").encode("cp1252")
+        text, spliced = self.clean(data)
+        self.assert_same_text(text, spliced, "cp1252")
+        self.assertIn("café crème, naïve".encode("cp1252"), spliced)
+        self.assertRaises(UnicodeDecodeError, spliced.decode, "utf-8")
+
+    def test_retimed_lines(self):
+        text, spliced = self.clean(srt("\n").encode("utf-8"))
+        self.assertNotIn("00:00:07,688", text)
+        self.assertNotIn("00:00:07,600", text)
+        self.assertNotIn(b"00:00:07,688", spliced)
+        self.assert_same_text(text, spliced, "utf-8")
+
+    def test_last_block_without_newline(self):
+        for eol in ("\n", "\r\n"):
+            text, spliced = self.clean(srt(eol, final_newline=False).encode("utf-8"))
+            self.assert_same_text(text, spliced, "utf-8")
+            self.assertTrue(spliced.endswith(("naïve" + eol).encode("utf-8")))
+
+
+if __name__ == "__main__":
+    unittest.main()